@@ -8,9 +8,10 @@ from ..core.db.database import async_get_db
 from ..core.exceptions.http_exceptions import ForbiddenException, RateLimitException, UnauthorizedException
 from ..core.logger import logging
 from ..core.security import oauth2_scheme, verify_token
-from ..core.utils.rate_limit import is_rate_limited
+from ..core.utils import principal_cache, rate_limit_rules
+from ..core.utils.rate_limit import check_rate_limit, rate_limit_headers
 from ..crud.crud_users import crud_users
-from ..models.user import User
+from ..schemas.rate_limit import sanitize_path
 
 logger = logging.getLogger(__name__)
 
@@ -19,18 +20,31 @@ DEFAULT_PERIOD = settings.DEFAULT_RATE_LIMIT_PERIOD
 
 
 async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[AsyncSession, Depends(async_get_db)]
+    request: Request,
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, Any] | None:
-    token_data = await verify_token(token, db)
+    memo = getattr(request.state, "current_user", None)
+    if memo is not None and memo[0] == token:
+        return memo[1]
+
+    token_data = await verify_token(token)
     if token_data is None:
         raise UnauthorizedException("User not authenticated.")
 
-    if "@" in token_data.username_or_email:
-        user: dict | None = await crud_users.get(db=db, email=token_data.username_or_email, is_deleted=False)
-    else:
-        user = await crud_users.get(db=db, username=token_data.username_or_email, is_deleted=False)
+    user = principal_cache.get(token_data.username_or_email)
+    if user is None:
+        loaded_at_generation = principal_cache.generation()
+        if "@" in token_data.username_or_email:
+            user = await crud_users.get(db=db, email=token_data.username_or_email, is_deleted=False)
+        else:
+            user = await crud_users.get(db=db, username=token_data.username_or_email, is_deleted=False)
+
+        if user:
+            principal_cache.put(token_data.username_or_email, user, loaded_at_generation)
 
     if user:
+        request.state.current_user = (token, user)
         return user
 
     raise UnauthorizedException("User not authenticated.")
@@ -46,11 +60,7 @@ async def get_optional_user(request: Request, db: AsyncSession = Depends(async_g
         if token_type.lower() != "bearer" or not token_value:
             return None
 
-        token_data = await verify_token(token_value, db)
-        if token_data is None:
-            return None
-
-        return await get_current_user(token_value, db=db)
+        return await get_current_user(request, token_value, db=db)
 
     except HTTPException as http_exc:
         if http_exc.status_code != 401:
@@ -69,29 +79,36 @@ async def get_current_superuser(current_user: Annotated[dict, Depends(get_curren
     return current_user
 
 
-# async def rate_limiter(
-#     request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], user: User | None = Depends(get_optional_user)
-# ) -> None:
-#     path = sanitize_path(request.url.path)
-#     if user:
-#         user_id = user["id"]
-#         if tier:
-#             rate_limit = await crud_rate_limits.get(db=db, tier_id=tier["id"], path=path)
-#             if rate_limit:
-#                 limit, period = rate_limit["limit"], rate_limit["period"]
-#             else:
-#                 logger.warning(
-#                     f"User {user_id} with tier '{tier['name']}' has no specific rate limit for path '{path}'. \
-#                         Applying default rate limit."
-#                 )
-#                 limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-#         else:
-#             logger.warning(f"User {user_id} has no assigned tier. Applying default rate limit.")
-#             limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-#     else:
-#         user_id = request.client.host
-#         limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-
-#     is_limited = await is_rate_limited(db=db, user_id=user_id, path=path, limit=limit, period=period)
-#     if is_limited:
-#         raise RateLimitException("Rate limit exceeded.")
+async def get_current_admin(current_user: Annotated[dict, Depends(get_current_user)]) -> dict:
+    # the user model has no superuser flag, the admin is the first user created from the settings
+    if current_user["username"] != settings.ADMIN_USERNAME:
+        raise ForbiddenException("You do not have enough privileges.")
+
+    return current_user
+
+
+async def rate_limiter(request: Request, user: Annotated[dict | None, Depends(get_optional_user)]) -> None:
+    route = request.scope.get("route")
+    path = sanitize_path(route.path_format if route is not None else request.url.path)
+
+    limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
+    if user:
+        user_id = user["id"]
+        tier_id = user.get("tier_id")
+        if tier_id is not None:
+            rule = await rate_limit_rules.get_rule(tier_id, path)
+            if rule is not None:
+                limit, period = rule
+    else:
+        user_id = request.client.host if request.client else "unknown"
+
+    try:
+        result = await check_rate_limit(user_id=user_id, path=path, limit=limit, period=period)
+    except Exception as e:
+        # an unreachable rate limit store must not take the whole API down with it
+        logger.error(f"Rate limit check failed, letting the request through: {e}")
+        return
+
+    request.state.rate_limit_headers = rate_limit_headers(result)
+    if not result.allowed:
+        raise RateLimitException("Rate limit exceeded.")
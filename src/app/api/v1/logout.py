@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Depends, Response
 from jose import JWTError
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...core.db.database import async_get_db
 from ...core.exceptions.http_exceptions import UnauthorizedException
 from ...core.security import blacklist_token, oauth2_scheme
 
@@ -10,11 +8,9 @@ router = APIRouter(tags=["login"])
 
 
 @router.post("/logout")
-async def logout(
-    response: Response, access_token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(async_get_db)
-) -> dict[str, str]:
+async def logout(response: Response, access_token: str = Depends(oauth2_scheme)) -> dict[str, str]:
     try:
-        await blacklist_token(token=access_token, db=db)
+        await blacklist_token(token=access_token)
         response.delete_cookie(key="refresh_token")
 
         return {"message": "Logged out successfully"}
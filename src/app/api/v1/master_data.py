@@ -1,22 +1,40 @@
+import os
+import uuid
+from datetime import UTC, datetime
 from typing import Annotated, Any
 
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
+from sqlalchemy import insert, literal, null, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_user
 from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
-from ...core.db.database import async_get_db
+from ...core.export import ExportFormat, export_response
+from ...core.db.database import async_get_db, async_get_read_db, read_sessionmaker
 from ...core.helper import validate_queries
+from ...core.pagination import CursorLimit, CursorPaginatedListResponse, cursor_paginate
+from ...core.utils import master_data_cache, queue
+from ...core.utils.cache import cache, delete_keys
+from ...core.utils.master_data_import import UPLOAD_DIR, ImportFormat, get_progress, set_progress, upload_path
 from ...models.master_data import MasterData
+from ...models.master_data_type import MasterDataType
 
 from ...crud.crud_master_data import crud_master_data
 from ...crud.crud_master_data_types import crud_master_data_types
+from ...middleware.client_cache_middleware import client_cache
 
 from ...schemas.master_data import (
+    MasterDataBulkCreate,
+    MasterDataBulkCreateResult,
+    MasterDataBulkDelete,
+    MasterDataBulkResult,
+    MasterDataBulkUpdate,
     MasterDataCreate,
     MasterDataCreateInternal,
+    MasterDataImportStatus,
     MasterDataRead,
     MasterDataUpdate,
     MasterDataUpdateInternal,
@@ -24,6 +42,7 @@ from ...schemas.master_data import (
 from ...schemas.user import UserRead
 
 db_dependency = Annotated[AsyncSession, Depends(async_get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(async_get_read_db)]
 current_user_dependency = Annotated[UserRead, Depends(get_current_user)]
 
 router = APIRouter(tags=["master_data"])
@@ -58,14 +77,177 @@ async def write_role(
     master_data_internal_dict = MasterDataCreateInternal(**master_data_internal_dict)
 
     created_master_data = await crud_master_data.create(db, object=master_data_internal_dict)
+    await master_data_cache.bump_version(master_data.code)
     return created_master_data
 
 
-@router.get("/master-data", response_model=PaginatedListResponse[MasterDataRead])
-async def read_roles(
+async def _lookup_for_bulk(
+    db: AsyncSession, names: frozenset[str] | set[str] = frozenset(), codes: frozenset[str] | set[str] = frozenset(),
+    ids: frozenset[int] | set[int] = frozenset(),
+) -> tuple[dict[str, int], set[str], dict[int, str]]:
+    """Run every lookup a bulk request needs in a single query.
+
+    Returns the ids of the live master data holding any of `names`, which of `codes` are existing
+    master data type codes, and the code of each live master data among `ids`.
+    """
+    stmt = union_all(
+        select(literal("name").label("kind"), MasterData.name.label("value"), MasterData.id.label("id")).where(
+            MasterData.name.in_(names), MasterData.is_deleted == False  # noqa: E712
+        ),
+        select(literal("code"), MasterDataType.code, null()).where(MasterDataType.code.in_(codes)),
+        select(literal("id"), MasterData.code, MasterData.id).where(
+            MasterData.id.in_(ids), MasterData.is_deleted == False  # noqa: E712
+        ),
+    )
+    rows = (await db.execute(stmt)).all()
+
+    ids_by_name = {value: id for kind, value, id in rows if kind == "name"}
+    existing_codes = {value for kind, value, _ in rows if kind == "code"}
+    codes_by_id = {id: value for kind, value, id in rows if kind == "id"}
+    return ids_by_name, existing_codes, codes_by_id
+
+
+def _bulk_error(index: int, detail: str, id: int | None = None) -> dict[str, Any]:
+    return {"index": index, "id": id, "detail": detail}
+
+
+@router.post("/master-data/bulk", response_model=MasterDataBulkCreateResult, status_code=201)
+async def write_master_data_bulk(
+    request: Request, current_user: current_user_dependency, db: db_dependency,
+    payload: MasterDataBulkCreate
+):
+    items = payload.items
+    ids_by_name, existing_codes, _ = await _lookup_for_bulk(
+        db, names={item.name for item in items}, codes={item.code for item in items}
+    )
+
+    errors = []
+    rows = []
+    seen_names = set()
+    now = datetime.now(UTC).replace(tzinfo=None)
+    for index, item in enumerate(items):
+        if item.name in ids_by_name or item.name in seen_names:
+            errors.append(_bulk_error(index, "Master data name already exists"))
+            continue
+        if item.code not in existing_codes:
+            errors.append(_bulk_error(index, "Master data type code not found"))
+            continue
+
+        seen_names.add(item.name)
+        rows.append(
+            {
+                **item.model_dump(),
+                "created_by": current_user["id"],
+                "updated_by": current_user["id"],
+                "created_at": now,
+                "updated_at": now,
+                "is_deleted": False,
+            }
+        )
+
+    created = []
+    if rows:
+        columns = [getattr(MasterData, field) for field in MasterDataRead.model_fields]
+        result = await db.execute(insert(MasterData).returning(*columns, sort_by_parameter_order=True), rows)
+        created = [dict(row) for row in result.mappings().all()]
+        await db.commit()
+        await master_data_cache.bump_version(*{row["code"] for row in created})
+
+    return {"data": created, "errors": errors}
+
+
+@router.patch("/master-data/bulk", response_model=MasterDataBulkResult)
+async def update_master_data_bulk(
     request: Request, current_user: current_user_dependency, db: db_dependency,
-    page: int = 1, items_per_page: int = 10
+    payload: MasterDataBulkUpdate
 ):
+    items = payload.items
+    ids_by_name, existing_codes, codes_by_id = await _lookup_for_bulk(
+        db,
+        names={item.name for item in items if item.name is not None},
+        codes={item.code for item in items if item.code is not None},
+        ids={item.id for item in items},
+    )
+
+    errors = []
+    rows = []
+    updated_ids = set()
+    names_claimed: dict[str, int] = {}
+    now = datetime.now(UTC).replace(tzinfo=None)
+    for index, item in enumerate(items):
+        if item.id not in codes_by_id:
+            errors.append(_bulk_error(index, "Master data not found", item.id))
+            continue
+        if item.id in updated_ids:
+            errors.append(_bulk_error(index, "Master data is updated more than once", item.id))
+            continue
+        if item.name is not None and (
+            ids_by_name.get(item.name, item.id) != item.id or names_claimed.get(item.name, item.id) != item.id
+        ):
+            errors.append(_bulk_error(index, "Master data name already exists", item.id))
+            continue
+        if item.code is not None and item.code not in existing_codes:
+            errors.append(_bulk_error(index, "Master data type code not found", item.id))
+            continue
+
+        updated_ids.add(item.id)
+        if item.name is not None:
+            names_claimed[item.name] = item.id
+        values = item.model_dump(exclude_unset=True, exclude={"id"})
+        rows.append({**values, "id": item.id, "updated_by": current_user["id"], "updated_at": now})
+
+    if rows:
+        await db.execute(update(MasterData), rows)
+        await db.commit()
+
+        await delete_keys(*[f"master_data_item:{row['id']}" for row in rows])
+        affected_codes = {codes_by_id[row["id"]] for row in rows} | {row["code"] for row in rows if row.get("code")}
+        await master_data_cache.bump_version(*affected_codes)
+
+    return {"ids": [row["id"] for row in rows], "errors": errors}
+
+
+@router.delete("/master-data/bulk", response_model=MasterDataBulkResult)
+async def delete_master_data_bulk(
+    request: Request, current_user: current_user_dependency, db: db_dependency,
+    payload: MasterDataBulkDelete
+):
+    _, _, codes_by_id = await _lookup_for_bulk(db, ids=set(payload.ids))
+
+    errors = [
+        _bulk_error(index, "Master data not found", id) for index, id in enumerate(payload.ids) if id not in codes_by_id
+    ]
+    deleted_ids = list(dict.fromkeys(id for id in payload.ids if id in codes_by_id))
+
+    if deleted_ids:
+        now = datetime.now(UTC).replace(tzinfo=None)
+        await db.execute(
+            update(MasterData)
+            .where(MasterData.id.in_(deleted_ids))
+            .values(is_deleted=True, deleted_at=now, updated_by=current_user["id"], updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        await delete_keys(*[f"master_data_item:{id}" for id in deleted_ids])
+        await master_data_cache.bump_version(*{codes_by_id[id] for id in deleted_ids})
+
+    return {"ids": deleted_ids, "errors": errors}
+
+
+@router.get(
+    "/master-data", response_model=PaginatedListResponse[MasterDataRead] | CursorPaginatedListResponse[MasterDataRead]
+)
+async def read_roles(
+    request: Request, current_user: current_user_dependency, db: read_db_dependency,
+    page: int = 1, items_per_page: int = 10,
+    cursor: str | None = None, limit: CursorLimit = 10,
+):
+    if cursor is not None:
+        return await cursor_paginate(
+            db=db, crud=crud_master_data, cursor=cursor, limit=limit, schema_to_select=MasterDataRead, is_deleted=False
+        )
+
     master_data = await crud_master_data.get_multi(
         db=db,
         offset=compute_offset(page, items_per_page),
@@ -78,61 +260,109 @@ async def read_roles(
     return response
 
 
+@router.get("/master-data/by-code/{code}", response_model=list[MasterDataRead])
+@client_cache()
+async def read_master_data_by_code(
+    request: Request, current_user: current_user_dependency, db: db_dependency,
+    code: str,
+):
+    return await master_data_cache.get_snapshot(db, code)
+
+
+@router.get("/master-data/export")
+async def export_master_data(
+    request: Request, current_user: current_user_dependency,
+    format: ExportFormat = "ndjson", code: str | None = None,
+):
+    stmt = (
+        select(*[getattr(MasterData, field) for field in MasterDataRead.model_fields])
+        .where(MasterData.is_deleted == False)  # noqa: E712
+        .order_by(MasterData.id)
+    )
+    if code is not None:
+        stmt = stmt.where(MasterData.code == code)
+
+    return export_response(stmt, read_sessionmaker(request), format, filename="master_data")
+
+
+def _save_upload(upload: UploadFile, path: str) -> None:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with open(path, "wb") as destination:
+        while chunk := upload.file.read(1024 * 1024):
+            destination.write(chunk)
+
+
+@router.post("/master-data/import", response_model=MasterDataImportStatus, status_code=202)
+async def import_master_data(
+    request: Request, current_user: current_user_dependency,
+    file: UploadFile, format: ImportFormat = "csv",
+):
+    import_id = uuid.uuid4().hex
+    await run_in_threadpool(_save_upload, file, upload_path(import_id, format))
+
+    await set_progress(queue.pool, import_id, status="queued")
+    await queue.pool.enqueue_job("import_master_data", import_id, format, current_user["id"])  # type: ignore
+    return {"import_id": import_id, "status": "queued"}
+
+
+@router.get("/master-data/import/{import_id}", response_model=MasterDataImportStatus)
+async def read_master_data_import(
+    request: Request, current_user: current_user_dependency,
+    import_id: str,
+):
+    progress = await get_progress(queue.pool, import_id)  # type: ignore
+    if progress is None:
+        raise NotFoundException("Import not found")
+    return {"import_id": import_id, **progress}
+
+
 @router.get("/master-data/{id}", response_model=MasterDataRead)
+@cache(key_prefix="master_data_item", resource_id_name="id", return_raw=True)
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
 ):
-    master_data = await crud_master_data.get(db=db, id=id, is_deleted=False)
+    master_data = await crud_master_data.get(db=db, id=id, is_deleted=False, schema_to_select=MasterDataRead)
     if not master_data:
         raise NotFoundException("Master data not found")
     return master_data
 
 
 @router.patch("/master-data/{id}")
+@cache(key_prefix="master_data_item", resource_id_name="id")
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
     values: MasterDataUpdate
 ):
-    await validate_queries(
-        db=db,
-        validation_list=[
-            {
-                "crud": crud_master_data, 
-                "is_exist": False,
-                "query_conditions": {"id": id, "is_deleted": False},
-                "error_message": "Master data not found"
-            }
-        ]
-    )
+    existing_master_data = await crud_master_data.get(db=db, id=id, is_deleted=False, schema_to_select=MasterDataRead)
+    if not existing_master_data:
+        raise NotFoundException("Master data not found")
 
     master_data_internal_dict = values.model_dump(exclude_unset=True)
     master_data_internal_dict["updated_by"] = current_user["id"]
 
     
     await crud_master_data.update(db=db, object=MasterDataUpdateInternal(**master_data_internal_dict), id=id)
+    affected_codes = [existing_master_data["code"]]
+    if values.code is not None:
+        affected_codes.append(values.code)
+    await master_data_cache.bump_version(*affected_codes)
 
     return {"status": "success"}
 
 
 @router.delete("/master-data/{id}")
+@cache(key_prefix="master_data_item", resource_id_name="id")
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
 ):
-    await validate_queries(
-        db=db,
-        validation_list=[
-            {
-                "crud": crud_master_data, 
-                "is_exist": False,
-                "query_conditions": {"id": id, "is_deleted": False},
-                "error_message": "Master data not found"
-            }
-        ]
-    )
+    existing_master_data = await crud_master_data.get(db=db, id=id, is_deleted=False, schema_to_select=MasterDataRead)
+    if not existing_master_data:
+        raise NotFoundException("Master data not found")
 
     await crud_master_data.delete(db=db, id=id,is_deleted=False)
+    await master_data_cache.bump_version(existing_master_data["code"])
 
     return {"status": "success"}
\ No newline at end of file
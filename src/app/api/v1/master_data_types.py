@@ -8,10 +8,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_user
 from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
-from ...core.db.database import async_get_db
+from ...core.db.database import async_get_db, async_get_read_db
 from ...core.helper import validate_queries
+from ...core.pagination import CursorLimit, CursorPaginatedListResponse, cursor_paginate
+from ...core.utils.cache import cache
 from ...models.master_data_type import MasterDataType
 from ...crud.crud_master_data_types import crud_master_data_types
+from ...middleware.client_cache_middleware import client_cache
 from ...schemas.master_data_type import (
     MasterDataTypeCreate,
     MasterDataTypeCreateInternal,
@@ -22,6 +25,7 @@ from ...schemas.master_data_type import (
 from ...schemas.user import UserRead
 
 db_dependency = Annotated[AsyncSession, Depends(async_get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(async_get_read_db)]
 current_user_dependency = Annotated[UserRead, Depends(get_current_user)]
 
 router = APIRouter(tags=["master_data_types"])
@@ -68,11 +72,26 @@ async def write_role(
 
 
 
-@router.get("/master-data-types", response_model=PaginatedListResponse[MasterDataTypeRead])
+@router.get(
+    "/master-data-types",
+    response_model=PaginatedListResponse[MasterDataTypeRead] | CursorPaginatedListResponse[MasterDataTypeRead],
+)
+@client_cache()
 async def read_roles(
-    request: Request, current_user: current_user_dependency, db: db_dependency,
-    page: int = 1, items_per_page: int = 10
+    request: Request, current_user: current_user_dependency, db: read_db_dependency,
+    page: int = 1, items_per_page: int = 10,
+    cursor: str | None = None, limit: CursorLimit = 10,
 ):
+    if cursor is not None:
+        return await cursor_paginate(
+            db=db,
+            crud=crud_master_data_types,
+            cursor=cursor,
+            limit=limit,
+            schema_to_select=MasterDataTypeRead,
+            is_deleted=False,
+        )
+
     master_data_types = await crud_master_data_types.get_multi(
         db=db,
         offset=compute_offset(page, items_per_page),
@@ -86,17 +105,21 @@ async def read_roles(
 
 
 @router.get("/master-data-types/{id}", response_model=MasterDataTypeRead)
+@cache(key_prefix="master_data_type", resource_id_name="id", return_raw=True)
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
 ):
-    master_data_type = await crud_master_data_types.get(db=db, id=id, is_deleted=False)
+    master_data_type = await crud_master_data_types.get(
+        db=db, id=id, is_deleted=False, schema_to_select=MasterDataTypeRead
+    )
     if not master_data_type:
         raise NotFoundException("Master data type not found")
     return master_data_type
 
 
 @router.patch("/master-data-types/{id}")
+@cache(key_prefix="master_data_type", resource_id_name="id")
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
@@ -124,6 +147,7 @@ async def read_roles(
 
 
 @router.delete("/master-data-types/{id}")
+@cache(key_prefix="master_data_type", resource_id_name="id")
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
@@ -0,0 +1,16 @@
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends
+
+from ...api.dependencies import get_current_admin
+from ...core.utils import cache, password_hashing
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def read_metrics(current_user: Annotated[dict, Depends(get_current_admin)]) -> dict[str, Any]:
+    return {
+        "password_hashing": password_hashing.metrics(),
+        "cache": cache.metrics(),
+    }
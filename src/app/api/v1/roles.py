@@ -8,8 +8,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_user
 from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
-from ...core.db.database import async_get_db
+from ...core.db.database import async_get_db, async_get_read_db
 from ...core.helper import validate_queries
+from ...core.pagination import CursorLimit, CursorPaginatedListResponse, cursor_paginate
+from ...core.utils.cache import cache
 from ...models.role import Role
 from ...crud.crud_roles import crud_roles
 from ...schemas.role import (
@@ -22,6 +24,7 @@ from ...schemas.role import (
 from ...schemas.user import UserRead
 
 db_dependency = Annotated[AsyncSession, Depends(async_get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(async_get_read_db)]
 current_user_dependency = Annotated[UserRead, Depends(get_current_user)]
 
 router = APIRouter(tags=["roles"])
@@ -53,16 +56,22 @@ async def write_role(
     return created_role
 
 
-@router.get("/roles", response_model=PaginatedListResponse[RoleRead])
+@router.get("/roles", response_model=PaginatedListResponse[RoleRead] | CursorPaginatedListResponse[RoleRead])
 async def read_roles(
-    request: Request, current_user: current_user_dependency, db: db_dependency,
-    page: int = 1, items_per_page: int = 10
+    request: Request, current_user: current_user_dependency, db: read_db_dependency,
+    page: int = 1, items_per_page: int = 10,
+    cursor: str | None = None, limit: CursorLimit = 10,
 ):
+    if cursor is not None:
+        return await cursor_paginate(
+            db=db, crud=crud_roles, cursor=cursor, limit=limit, schema_to_select=RoleRead, is_deleted=False
+        )
+
     roles = await crud_roles.get_multi(
         db=db,
         offset=compute_offset(page, items_per_page),
         limit=items_per_page,
-        schema_to_select=UserRead,
+        schema_to_select=RoleRead,
         is_deleted=False,
     )
 
@@ -71,18 +80,20 @@ async def read_roles(
 
 
 @router.get("/roles/{id}", response_model=RoleRead)
+@cache(key_prefix="role", resource_id_name="id", return_raw=True)
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
     page: int = 1, item_per_pages: int = 10,
 ):
-    role = await crud_roles.get(db=db, id=id, is_deleted=False)
+    role = await crud_roles.get(db=db, id=id, is_deleted=False, schema_to_select=RoleRead)
     if not role:
         raise NotFoundException("Role not found")
     return role
 
 
 @router.patch("/roles/{id}")
+@cache(key_prefix="role", resource_id_name="id", pattern_to_invalidate_extra=["user:"])
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
@@ -110,6 +121,7 @@ async def read_roles(
 
 
 @router.delete("/roles/{id}")
+@cache(key_prefix="role", resource_id_name="id", pattern_to_invalidate_extra=["user:"])
 async def read_roles(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int,
@@ -1,21 +1,35 @@
+from datetime import UTC, datetime
 from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, Request
 from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
-from fastcrud import JoinConfig, aliased
 
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_
-from ...api.dependencies import get_current_superuser, get_current_user
-from ...core.db.database import async_get_db
+from sqlalchemy import and_, func, insert, literal, literal_column, null, select, union_all
+from ...api.dependencies import get_current_user
+from ...core.db.database import async_get_db, async_get_read_db, read_sessionmaker
 from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
-from ...core.security import blacklist_token, get_password_hash, oauth2_scheme
-from ...core.helper import remove_duplicates, validate_queries
+from ...core.export import ExportFormat, export_response
+from ...core.security import blacklist_token, hash_password, hash_passwords, oauth2_scheme
+from ...core.helper import validate_queries
+from ...core.pagination import CursorLimit, CursorPaginatedListResponse, cursor_paginated_response, decode_cursor
+from ...core.utils import principal_cache
+from ...core.utils.cache import cache
 from ...crud.crud_users import crud_users
 from ...crud.crud_roles import crud_roles
 from ...crud.crud_user_role import crud_user_role
-from ...schemas.user import UserCreate, UserCreateInternal, UserRead, UserUpdate, UserUpdateInternal, UserReadSub
-from ...schemas.user_role import UserRoleCreateInternal, UserRoleRead
+from ...schemas.user import (
+    UserBulkCreate,
+    UserBulkCreateResult,
+    UserCreate,
+    UserCreateInternal,
+    UserRead,
+    UserReadSub,
+    UserUpdate,
+    UserUpdateInternal,
+)
+from ...schemas.user_role import UserRoleCreateInternal
 from ...schemas.role import RoleRead
 
 from ...models.user import User, UserRole
@@ -25,6 +39,7 @@ from ...models.role import Role
 
 router = APIRouter(tags=["users"])
 db_dependency = Annotated[AsyncSession, Depends(async_get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(async_get_read_db)]
 current_user_dependency = Annotated[UserRead, Depends(get_current_user)]
 
 @router.post("/user", status_code=201)
@@ -61,7 +76,7 @@ async def write_user(
         raise NotFoundException("One or more roles not found")
 
     user_internal_dict = user.model_dump()
-    user_internal_dict["hashed_password"] = get_password_hash(password=user_internal_dict["password"])
+    user_internal_dict["hashed_password"] = await hash_password(password=user_internal_dict["password"])
     del user_internal_dict["password"]
 
     try:
@@ -80,6 +95,7 @@ async def write_user(
             await crud_user_role.create(db=db, object=UserRoleCreateInternal(**user_role_internal_dict), commit=False)
 
         await db.commit()
+        await principal_cache.revoke(created_user.id)
     
         user_with_roles_internal_dict = UserRead(**(created_user.__dict__)).model_dump()
         user_with_roles_internal_dict["roles"] = roles["data"]
@@ -90,22 +106,145 @@ async def write_user(
         return {"error": e.__repr__}
 
 
+async def _lookup_for_bulk(
+    db: AsyncSession, usernames: set[str], emails: set[str], names: set[str], role_ids: set[int]
+) -> tuple[dict[str, set[str]], dict[int, str]]:
+    """Run every lookup a bulk creation needs in a single query.
+
+    Returns which of `usernames`, `emails` and `names` are taken, keyed by kind, and the name of each live
+    role among `role_ids`. Usernames and emails are unique even among deleted users, names only among live ones.
+    """
+    stmt = union_all(
+        select(literal("username").label("kind"), User.username.label("value"), null().label("id")).where(
+            User.username.in_(usernames)
+        ),
+        select(literal("email"), User.email, null()).where(User.email.in_(emails)),
+        select(literal("name"), User.name, null()).where(
+            User.name.in_(names), User.is_deleted == False  # noqa: E712
+        ),
+        select(literal("role"), Role.name, Role.id).where(
+            Role.id.in_(role_ids), Role.is_deleted == False  # noqa: E712
+        ),
+    )
+    rows = (await db.execute(stmt)).all()
+
+    taken: dict[str, set[str]] = {"username": set(), "email": set(), "name": set()}
+    role_names = {}
+    for kind, value, id in rows:
+        if kind == "role":
+            role_names[id] = value
+        else:
+            taken[kind].add(value)
+    return taken, role_names
+
+
+@router.post("/users/bulk", response_model=UserBulkCreateResult, status_code=201)
+async def write_users_bulk(
+    request: Request, current_user: current_user_dependency, db: db_dependency,
+    payload: UserBulkCreate
+):
+    items = payload.items
+    taken, role_names = await _lookup_for_bulk(
+        db,
+        usernames={item.username for item in items},
+        emails={item.email for item in items},
+        names={item.name for item in items},
+        role_ids={role_id for item in items for role_id in item.roles or []},
+    )
+
+    errors = []
+    valid = []
+    for index, item in enumerate(items):
+        conflict = next((kind for kind in ("email", "username", "name") if getattr(item, kind) in taken[kind]), None)
+        if conflict is not None:
+            errors.append({"index": index, "detail": f"{conflict.capitalize()} already exists"})
+            continue
+        if any(role_id not in role_names for role_id in item.roles or []):
+            errors.append({"index": index, "detail": "One or more roles not found"})
+            continue
+
+        # later items of the batch conflict with earlier ones like with existing users
+        for kind in ("email", "username", "name"):
+            taken[kind].add(getattr(item, kind))
+        valid.append(item)
+
+    if not valid:
+        return {"data": [], "errors": errors}
+
+    hashed_passwords = await hash_passwords([item.password for item in valid])
+
+    now = datetime.now(UTC)
+    rows = [
+        {
+            **UserCreateInternal(**item.model_dump(), hashed_password=hashed_password).model_dump(),
+            "created_by": current_user["id"],
+            "updated_by": current_user["id"],
+            "created_at": now,
+            "updated_at": now,
+            "is_deleted": False,
+        }
+        for item, hashed_password in zip(valid, hashed_passwords)
+    ]
+    columns = [getattr(User, field) for field in UserRead.model_fields]
+    result = await db.execute(insert(User).returning(*columns, sort_by_parameter_order=True), rows)
+    created = [dict(row) for row in result.mappings().all()]
+
+    user_roles = []
+    for user, item in zip(created, valid):
+        user["roles"] = [RoleRead(id=role_id, name=role_names[role_id]) for role_id in dict.fromkeys(item.roles or [])]
+        user_roles.extend(
+            {
+                "user_id": user["id"],
+                "role_id": role.id,
+                "created_by": current_user["id"],
+                "updated_by": current_user["id"],
+                "created_at": now.replace(tzinfo=None),
+                "updated_at": now.replace(tzinfo=None),
+                "is_deleted": False,
+            }
+            for role in user["roles"]
+        )
+    if user_roles:
+        await db.execute(insert(UserRole), user_roles)
+
+    await db.commit()
+    return {"data": created, "errors": errors}
+
+
 @router.get("/users")
 async def read_users(
-    request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
-) -> PaginatedListResponse[UserReadSub]:
-    users = await get_joined_users(db)
+    request: Request, db: read_db_dependency, page: int = 1, items_per_page: int = 10,
+    cursor: str | None = None, limit: CursorLimit = 10,
+) -> PaginatedListResponse[UserReadSub] | CursorPaginatedListResponse[UserReadSub]:
+    if cursor is not None:
+        last_id = decode_cursor(cursor)
+        filters = {"id__gt": last_id} if last_id is not None else {}
+        users = await get_joined_users(db, limit=limit + 1, with_total_count=False, **filters)
+        return cursor_paginated_response(users["data"], limit)
+
+    users = await get_joined_users(db, offset=compute_offset(page, items_per_page), limit=items_per_page)
     response: dict[str, Any] = paginated_response(crud_data=users, page=page, items_per_page=items_per_page)
     return response
 
 
 @router.get("/users/me")
-async def read_users_me(request: Request, current_user: current_user_dependency, db: db_dependency) -> UserReadSub:
+async def read_users_me(request: Request, current_user: current_user_dependency, db: read_db_dependency) -> UserReadSub:
     user = await get_joined_users(db, get_one=True, id=current_user["id"])
     return user
 
 
+@router.get("/users/export")
+async def export_users(request: Request, current_user: current_user_dependency, format: ExportFormat = "ndjson"):
+    stmt = (
+        select(*[getattr(User, field) for field in UserRead.model_fields])
+        .where(User.is_deleted == False)  # noqa: E712
+        .order_by(User.id)
+    )
+    return export_response(stmt, read_sessionmaker(request), format, filename="users")
+
+
 @router.get("/users/{id}")
+@cache(key_prefix="user", resource_id_name="id", return_raw=True, lock_timeout=2)
 async def read_user(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int
@@ -117,6 +256,7 @@ async def read_user(
 
 
 @router.patch("/users/{id}")
+@cache(key_prefix="user", resource_id_name="id")
 async def update_user(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int, values: UserUpdate
@@ -136,12 +276,14 @@ async def update_user(
     user_internal_dict = values.model_dump(exclude_unset=True)
     user_internal_dict["updated_by"] = current_user["id"]
 
-    await crud_users.update(db=db, object=UserUpdateInternal(**user_internal_dict), id=id, commit=False)
+    await crud_users.update(db=db, object=UserUpdateInternal(**user_internal_dict), id=id)
+    await principal_cache.revoke(id)
 
     return {"status": "Update successfully"}
 
 
 @router.delete("/users/{id}")
+@cache(key_prefix="user", resource_id_name="id")
 async def delete_user(
     request: Request, current_user: current_user_dependency, db: db_dependency,
     id: int
@@ -159,44 +301,40 @@ async def delete_user(
     )
 
     await crud_users.delete(db=db, id=id, is_deleted=False)
+    await principal_cache.revoke(id)
     return {"message": "Delete Successfully"}
 
 
 # ============= Local Helper =============
-async def get_joined_users(db, get_one=False,**kwags):
-    users = await crud_users.get_multi_joined(
-        db=db,
-        is_deleted=False,
-        schema_to_select=UserReadSub,
-        return_as_model=True,
-        nest_joins=True,
-        joins_config=[
-            JoinConfig(
-                model=UserRole,
-                join_on=and_(User.id == UserRole.user_id, UserRole.is_deleted == False),
-                join_prefix="user_role",
-                schema_to_select=UserRoleRead,
-                join_type="left",
-                relationship_type="one-to-many",
-            ),
-            JoinConfig(
-                model=Role,
-                join_on=and_(UserRole.role_id == Role.id, Role.is_deleted == False),
-                join_prefix="roles",
-                schema_to_select=RoleRead,
-                join_type="left",
-                relationship_type="one-to-many",
-            ),
-        ],
-        **kwags
+async def get_joined_users(db, get_one=False, offset=None, limit=None, with_total_count=True, **kwags):
+    # page over user ids first so the role join only fans out for the users being returned
+    filters = crud_users._parse_filters(is_deleted=False, **kwags)
+    page_ids = select(User.id).where(*filters).order_by(User.id).offset(offset).limit(limit).subquery()
+
+    # roles are aggregated per user in Postgres, so every user comes back as a single row
+    role = func.jsonb_build_object(literal_column("'id'"), Role.id, literal_column("'name'"), Role.name)
+    roles = func.coalesce(
+        func.jsonb_agg(role.distinct()).filter(Role.id.is_not(None)), literal_column("'[]'::jsonb"), type_=JSONB
+    ).label("roles")
+
+    stmt = (
+        select(*[getattr(User, field) for field in UserRead.model_fields], roles)
+        .join(page_ids, User.id == page_ids.c.id)
+        .outerjoin(UserRole, and_(User.id == UserRole.user_id, UserRole.is_deleted == False))
+        .outerjoin(Role, and_(UserRole.role_id == Role.id, Role.is_deleted == False))
+        .group_by(User.id)
+        .order_by(User.id)
     )
-
-    for user in users["data"]:
-        user.roles = remove_duplicates(user.roles)
+    rows = (await db.execute(stmt)).mappings().all()
+    data = [UserReadSub(**row) for row in rows]
 
     if (get_one):
-        if not users["data"]:
+        if not data:
             return None
-        return users["data"][0]
+        return data[0]
+
+    if not with_total_count:
+        return {"data": data}
 
-    return users
\ No newline at end of file
+    total_count = await crud_users.count(db=db, is_deleted=False, **kwags)
+    return {"data": data, "total_count": total_count}
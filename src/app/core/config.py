@@ -57,6 +57,47 @@ class PostgresSettings(DatabaseSettings):
     POSTGRES_ASYNC_PREFIX: str = config("POSTGRES_ASYNC_PREFIX", default="postgresql+asyncpg://")
     POSTGRES_URI: str = f"{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
     POSTGRES_URL: str | None = config("POSTGRES_URL", default=None)
+    # comma separated, in the same user:password@host:port/db form as POSTGRES_URI
+    POSTGRES_READ_REPLICA_URIS: str = config("POSTGRES_READ_REPLICA_URIS", default="")
+    POSTGRES_READ_REPLICA_HEALTH_INTERVAL: int = config("POSTGRES_READ_REPLICA_HEALTH_INTERVAL", default=5)
+    POSTGRES_READ_REPLICA_MAX_LAG: float = config("POSTGRES_READ_REPLICA_MAX_LAG", default=5.0)
+    POSTGRES_READ_AFTER_WRITE_WINDOW: int = config("POSTGRES_READ_AFTER_WRITE_WINDOW", default=10)
+
+
+class DatabasePoolSettings(BaseSettings):
+    # per worker process: with gunicorn -w 4 the app may open up to 4 * (POOL_SIZE + MAX_OVERFLOW) connections,
+    # which must stay below Postgres' max_connections minus the connections used by workers and migrations
+    DATABASE_POOL_SIZE: int = config("DATABASE_POOL_SIZE", default=5)
+    DATABASE_MAX_OVERFLOW: int = config("DATABASE_MAX_OVERFLOW", default=10)
+    DATABASE_POOL_TIMEOUT: int = config("DATABASE_POOL_TIMEOUT", default=10)
+    DATABASE_POOL_RECYCLE: int = config("DATABASE_POOL_RECYCLE", default=1800)
+    DATABASE_POOL_PRE_PING: bool = config("DATABASE_POOL_PRE_PING", cast=bool, default=True)
+    DATABASE_POOL_WARMUP_SIZE: int = config("DATABASE_POOL_WARMUP_SIZE", default=5)
+    # set to 0 behind pgbouncer in transaction pooling mode
+    DATABASE_STATEMENT_CACHE_SIZE: int = config("DATABASE_STATEMENT_CACHE_SIZE", default=100)
+    DATABASE_STATEMENT_TIMEOUT_MS: int = config("DATABASE_STATEMENT_TIMEOUT_MS", default=30000)
+
+
+class PasswordHashingSettings(BaseSettings):
+    PASSWORD_HASH_WORKERS: int = config("PASSWORD_HASH_WORKERS", default=4)
+    PASSWORD_HASH_MAX_QUEUE: int = config("PASSWORD_HASH_MAX_QUEUE", default=64)
+
+
+class TokenCacheSettings(BaseSettings):
+    TOKEN_CACHE_MAX_SIZE: int = config("TOKEN_CACHE_MAX_SIZE", default=10000)
+    TOKEN_CACHE_TTL: int = config("TOKEN_CACHE_TTL", default=60)
+
+
+class PrincipalCacheSettings(BaseSettings):
+    PRINCIPAL_CACHE_MAX_SIZE: int = config("PRINCIPAL_CACHE_MAX_SIZE", default=10000)
+    PRINCIPAL_CACHE_TTL: int = config("PRINCIPAL_CACHE_TTL", default=30)
+
+
+class TokenBlacklistSettings(BaseSettings):
+    TOKEN_BLACKLIST_BLOOM_CAPACITY: int = config("TOKEN_BLACKLIST_BLOOM_CAPACITY", default=100000)
+    TOKEN_BLACKLIST_BLOOM_ERROR_RATE: float = config("TOKEN_BLACKLIST_BLOOM_ERROR_RATE", default=0.001)
+    TOKEN_BLACKLIST_BLOOM_REFRESH: int = config("TOKEN_BLACKLIST_BLOOM_REFRESH", default=30)
+    TOKEN_BLACKLIST_AUDIT: bool = config("TOKEN_BLACKLIST_AUDIT", cast=bool, default=True)
 
 
 class FirstUserSettings(BaseSettings):
@@ -71,13 +112,45 @@ class TestSettings(BaseSettings):
 
 
 class RedisCacheSettings(BaseSettings):
+    # the cache needs Redis 7 or later
     REDIS_CACHE_HOST: str = config("REDIS_CACHE_HOST", default="localhost")
     REDIS_CACHE_PORT: int = config("REDIS_CACHE_PORT", default=6379)
     REDIS_CACHE_URL: str = f"redis://{REDIS_CACHE_HOST}:{REDIS_CACHE_PORT}"
+    REDIS_CACHE_INVALIDATION_CHANNEL: str = config("REDIS_CACHE_INVALIDATION_CHANNEL", default="cache:invalidation")
+    REDIS_CACHE_L1_MAX_BYTES: int = config("REDIS_CACHE_L1_MAX_BYTES", default=64 * 1024 * 1024)
+    REDIS_CACHE_L1_TTL: int = config("REDIS_CACHE_L1_TTL", default=30)
+    REDIS_CACHE_CODEC: str = config("REDIS_CACHE_CODEC", default="orjson")
+    REDIS_CACHE_COMPRESSION: str = config("REDIS_CACHE_COMPRESSION", default="zstd")
+    REDIS_CACHE_COMPRESSION_THRESHOLD: int = config("REDIS_CACHE_COMPRESSION_THRESHOLD", default=4096)
+
+
+class MasterDataCacheSettings(BaseSettings):
+    MASTER_DATA_CACHE_LOCAL_TTL: int = config("MASTER_DATA_CACHE_LOCAL_TTL", default=300)
+    MASTER_DATA_CACHE_SNAPSHOT_TTL: int = config("MASTER_DATA_CACHE_SNAPSHOT_TTL", default=86400)
+
+
+class MasterDataImportSettings(BaseSettings):
+    # uploads are handed over to the arq worker through this directory, so the API and the worker must see the
+    # same one, e.g. the `master-data-imports` volume of docker-compose.yml. A worker on another host fails the job
+    MASTER_DATA_IMPORT_DIR: str = config("MASTER_DATA_IMPORT_DIR", default="/tmp/master_data_imports")
+    MASTER_DATA_IMPORT_CHUNK_SIZE: int = config("MASTER_DATA_IMPORT_CHUNK_SIZE", default=10000)
+    MASTER_DATA_IMPORT_PROGRESS_TTL: int = config("MASTER_DATA_IMPORT_PROGRESS_TTL", default=86400)
+    # replaces DATABASE_STATEMENT_TIMEOUT_MS for the final upsert, which may cover millions of rows. 0 disables it
+    MASTER_DATA_IMPORT_STATEMENT_TIMEOUT_MS: int = config("MASTER_DATA_IMPORT_STATEMENT_TIMEOUT_MS", default=0)
 
 
 class ClientSideCacheSettings(BaseSettings):
     CLIENT_CACHE_MAX_AGE: int = config("CLIENT_CACHE_MAX_AGE", default=60)
+    CLIENT_CACHE_ETAG_MAX_BYTES: int = config("CLIENT_CACHE_ETAG_MAX_BYTES", default=1024 * 1024)
+
+
+class CompressionSettings(BaseSettings):
+    COMPRESSION_MINIMUM_SIZE: int = config("COMPRESSION_MINIMUM_SIZE", default=1024)
+    COMPRESSION_CONTENT_TYPES: str = config("COMPRESSION_CONTENT_TYPES", default="application/json,text/")
+    COMPRESSION_ENCODINGS: str = config("COMPRESSION_ENCODINGS", default="zstd,br,gzip")
+    COMPRESSION_GZIP_LEVEL: int = config("COMPRESSION_GZIP_LEVEL", default=6)
+    COMPRESSION_BROTLI_QUALITY: int = config("COMPRESSION_BROTLI_QUALITY", default=4)
+    COMPRESSION_ZSTD_LEVEL: int = config("COMPRESSION_ZSTD_LEVEL", default=3)
 
 
 class RedisQueueSettings(BaseSettings):
@@ -91,9 +164,21 @@ class RedisRateLimiterSettings(BaseSettings):
     REDIS_RATE_LIMIT_URL: str = f"redis://{REDIS_RATE_LIMIT_HOST}:{REDIS_RATE_LIMIT_PORT}"
 
 
+class RateLimitAlgorithm(Enum):
+    FIXED_WINDOW = "fixed_window"
+    SLIDING_WINDOW = "sliding_window"
+    GCRA = "gcra"
+
+
 class DefaultRateLimitSettings(BaseSettings):
-    DEFAULT_RATE_LIMIT_LIMIT: int = config("DEFAULT_RATE_LIMIT_LIMIT", default=10)
-    DEFAULT_RATE_LIMIT_PERIOD: int = config("DEFAULT_RATE_LIMIT_PERIOD", default=3600)
+    # applies per route to anonymous clients and to users whose tier has no rule for the route
+    DEFAULT_RATE_LIMIT_LIMIT: int = config("DEFAULT_RATE_LIMIT_LIMIT", default=600)
+    DEFAULT_RATE_LIMIT_PERIOD: int = config("DEFAULT_RATE_LIMIT_PERIOD", default=60)
+    DEFAULT_RATE_LIMIT_ALGORITHM: RateLimitAlgorithm = config("DEFAULT_RATE_LIMIT_ALGORITHM", default="sliding_window")
+    RATE_LIMIT_RULES_TTL: int = config("RATE_LIMIT_RULES_TTL", default=60)
+    RATE_LIMIT_APPROXIMATE: bool = config("RATE_LIMIT_APPROXIMATE", cast=bool, default=False)
+    RATE_LIMIT_FLUSH_INTERVAL_MS: int = config("RATE_LIMIT_FLUSH_INTERVAL_MS", default=100)
+    RATE_LIMIT_RESERVE_FRACTION: float = config("RATE_LIMIT_RESERVE_FRACTION", default=0.1)
 
 
 class EnvironmentOption(Enum):
@@ -109,11 +194,19 @@ class EnvironmentSettings(BaseSettings):
 class Settings(
     AppSettings,
     PostgresSettings,
+    DatabasePoolSettings,
     CryptSettings,
+    PasswordHashingSettings,
+    TokenCacheSettings,
+    TokenBlacklistSettings,
+    PrincipalCacheSettings,
     FirstUserSettings,
     TestSettings,
     RedisCacheSettings,
+    MasterDataCacheSettings,
+    MasterDataImportSettings,
     ClientSideCacheSettings,
+    CompressionSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
     DefaultRateLimitSettings,
@@ -1,8 +1,19 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import hashlib
+import itertools
+import time
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, Session, sessionmaker
 
 from ..config import settings
+from ..logger import logging
+from ..utils import pubsub
+
+logger = logging.getLogger(__name__)
 
 
 class Base(DeclarativeBase, MappedAsDataclass):
@@ -12,13 +23,183 @@ class Base(DeclarativeBase, MappedAsDataclass):
 DATABASE_URI = settings.POSTGRES_URI
 DATABASE_PREFIX = settings.POSTGRES_ASYNC_PREFIX
 DATABASE_URL = f"{DATABASE_PREFIX}{DATABASE_URI}"
+READ_REPLICA_URIS = [uri.strip() for uri in settings.POSTGRES_READ_REPLICA_URIS.split(",") if uri.strip()]
+
+PRIMARY_PIN_TOPIC = "primary_pin"
+READ_AFTER_WRITE_WINDOW = settings.POSTGRES_READ_AFTER_WRITE_WINDOW
+REPLICA_HEALTH_INTERVAL = settings.POSTGRES_READ_REPLICA_HEALTH_INTERVAL
+REPLICA_MAX_LAG = settings.POSTGRES_READ_REPLICA_MAX_LAG
+
+_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "statement_timeout": str(settings.DATABASE_STATEMENT_TIMEOUT_MS),
+                "application_name": settings.APP_NAME,
+            },
+        },
+    )
 
-async_engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+
+async_engine = _create_engine(DATABASE_URL)
 
 local_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
 
+read_engines = [_create_engine(f"{DATABASE_PREFIX}{uri}") for uri in READ_REPLICA_URIS]
+read_sessions = [sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False) for engine in read_engines]
+
+_replica_healthy = [True] * len(read_engines)
+_replica_cycle = itertools.cycle(range(len(read_engines)))
+_primary_pins: dict[str, float] = {}
+_pin_all_until = 0.0
+health_checker: asyncio.Task | None = None
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    session.info["committed"] = True
+
 
-async def async_get_db() -> AsyncSession:
+def _pin_key(request: Request) -> str | None:
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def _pin_to_primary(key: str | None) -> None:
+    """Send the reads of a client to the primary for a while. Called with None when pins may have been lost."""
+    global _pin_all_until
+    now = time.monotonic()
+    if key is None:
+        _pin_all_until = now + READ_AFTER_WRITE_WINDOW
+        return
+
+    _primary_pins[key] = now + READ_AFTER_WRITE_WINDOW
+    if len(_primary_pins) > 10000:
+        for expired in [pin for pin, deadline in _primary_pins.items() if deadline <= now]:
+            del _primary_pins[expired]
+
+
+def _is_pinned_to_primary(request: Request) -> bool:
+    now = time.monotonic()
+    if now < _pin_all_until:
+        return True
+
+    key = _pin_key(request)
+    return key is not None and _primary_pins.get(key, 0.0) > now
+
+
+async def async_get_db(request: Request) -> AsyncSession:
     async_session = local_session
     async with async_session() as db:
         yield db
+
+        # keep this client's next reads on the primary, so they see what was just written
+        if db.info.get("committed") and read_engines:
+            key = _pin_key(request)
+            if key is not None:
+                try:
+                    await pubsub.publish(PRIMARY_PIN_TOPIC, key)
+                except Exception as e:
+                    logger.error(f"Failed to broadcast the primary pin of a client: {e}")
+
+
+def read_sessionmaker(request: Request) -> sessionmaker:
+    """Return the session factory of a healthy read replica, picked round robin.
+
+    Falls back to the primary when no replica is configured or healthy, and for clients that committed
+    a write in the last `POSTGRES_READ_AFTER_WRITE_WINDOW` seconds, so they read their own writes.
+    """
+    if read_engines and not _is_pinned_to_primary(request):
+        for _ in range(len(read_engines)):
+            index = next(_replica_cycle)
+            if _replica_healthy[index]:
+                return read_sessions[index]
+    return local_session
+
+
+async def async_get_read_db(request: Request) -> AsyncSession:
+    """Yield a session from `read_sessionmaker`. Only use it for endpoints that do not write."""
+    async_session = read_sessionmaker(request)
+    async with async_session() as db:
+        yield db
+
+
+async def _check_replica(index: int) -> bool:
+    try:
+        async with asyncio.timeout(REPLICA_HEALTH_INTERVAL):
+            async with read_engines[index].connect() as connection:
+                lag = (await connection.execute(_REPLICA_LAG_QUERY)).scalar_one()
+        return float(lag) <= REPLICA_MAX_LAG
+
+    except Exception as e:
+        logger.warning(f"Read replica {index} failed its health check: {e}")
+        return False
+
+
+async def _check_replicas_periodically() -> None:
+    while True:
+        results = await asyncio.gather(*[_check_replica(index) for index in range(len(read_engines))])
+        for index, healthy in enumerate(results):
+            if healthy != _replica_healthy[index]:
+                logger.info(f"Read replica {index} is now {'healthy' if healthy else 'unhealthy'}.")
+            _replica_healthy[index] = healthy
+        await asyncio.sleep(REPLICA_HEALTH_INTERVAL)
+
+
+async def start_replica_health_checks() -> None:
+    global health_checker
+    if read_engines:
+        health_checker = asyncio.create_task(_check_replicas_periodically())
+
+
+async def stop_replica_health_checks() -> None:
+    global health_checker
+    if health_checker is None:
+        return
+
+    health_checker.cancel()
+    try:
+        await health_checker
+    except asyncio.CancelledError:
+        pass
+    health_checker = None
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    for engine in read_engines:
+        await engine.dispose()
+
+
+async def warm_up_pool(size: int) -> None:
+    """Open `size` connections concurrently and return them to the pool, so the first requests don't pay for
+    connection setup. Failures are logged rather than raised, since the pool opens connections on demand anyway."""
+    size = min(size, settings.DATABASE_POOL_SIZE)
+    connections = [engine.connect() for engine in [async_engine, *read_engines] for _ in range(size)]
+    results = await asyncio.gather(*[connection.start() for connection in connections], return_exceptions=True)
+    for connection, result in zip(connections, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to open a database connection during warm-up: {result}")
+        else:
+            await connection.close()
+
+
+pubsub.subscribe(PRIMARY_PIN_TOPIC, _pin_to_primary)
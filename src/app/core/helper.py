@@ -1,21 +1,12 @@
 from typing import Annotated, TypedDict, Dict, Union
 from fastapi import Depends
 from ..core.db.database import async_get_db
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastcrud import FastCRUD, JoinConfig
 from ..core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
 
 
-def remove_duplicates(lst):
-    seen = set()
-    result = []
-    for item in lst:
-        if item.id not in seen:
-            result.append(item)
-            seen.add(item.id)
-    return result
-
-
 async def validate_query(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     crud: FastCRUD,
@@ -48,13 +39,29 @@ async def validate_queries(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     validation_list: list[ValidationItem]
 ):
+    """Run a list of existence validations and raise for the first one that fails.
+
+    Every check without `nest_joins` is compiled into an `EXISTS` column of a single `SELECT`, so
+    all of them, whatever table they target, cost one round trip. Checks with `nest_joins` are run
+    separately, in order, and only if every earlier check passed.
+    """
+    existence_columns = [
+        select(item["crud"].model).where(*item["crud"]._parse_filters(**item["query_conditions"])).exists()
+        for item in validation_list
+        if not item.get("nest_joins", False)
+    ]
+    found = iter((await db.execute(select(*existence_columns))).one() if existence_columns else ())
+
     for item in validation_list:
-        await validate_query(
-            db=db,
-            crud=item['crud'],
-            is_exist=item.get("is_exist", False),
-            error_message=item['error_message'],
-            query_conditions=item['query_conditions'],
-            nest_joins=item.get("nest_joins", False),
-            joins_config=item.get("joins_config", None)
-        )
\ No newline at end of file
+        if item.get("nest_joins", False):
+            entity = await item["crud"].get_joined(
+                db, **item["query_conditions"], nest_joins=True, joins_config=item.get("joins_config", None)
+            )
+            exists = bool(entity)
+        else:
+            exists = next(found)
+
+        if exists and item.get("is_exist", False):
+            raise DuplicateValueException(item["error_message"])
+        if not exists and not item.get("is_exist", False):
+            raise NotFoundException(item["error_message"])
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from typing import Annotated, Any, Generic, TypeVar
+
+from fastapi import Query
+from fastcrud import FastCRUD
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .exceptions.http_exceptions import BadRequestException
+
+SchemaType = TypeVar("SchemaType", bound=BaseModel)
+
+MAX_CURSOR_LIMIT = 100
+CursorLimit = Annotated[int, Query(ge=1, le=MAX_CURSOR_LIMIT)]
+
+
+class CursorPaginatedListResponse(BaseModel, Generic[SchemaType]):
+    data: list[SchemaType]
+    limit: int
+    next_cursor: str | None = None
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the id of the last item of a page into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int | None:
+    """Decode a cursor into the id to continue after.
+
+    Parameters
+    ----------
+    cursor: str
+        The cursor returned as `next_cursor` by the previous page, or an empty string for the first page.
+
+    Returns
+    -------
+    int | None
+        The id of the last item of the previous page, or None for the first page.
+
+    Raises
+    ------
+    BadRequestException
+        If the cursor was not produced by `encode_cursor`.
+    """
+    if not cursor:
+        return None
+
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise BadRequestException("Invalid cursor.")
+
+    if not isinstance(last_id, int):
+        raise BadRequestException("Invalid cursor.")
+
+    return last_id
+
+
+def cursor_paginated_response(data: list[Any], limit: int) -> dict[str, Any]:
+    """Build a cursor paginated response from up to `limit + 1` items ordered by id.
+
+    Fetching one item more than the page size tells whether there is a next page without a `COUNT(*)`.
+
+    Parameters
+    ----------
+    data: list[Any]
+        The items, as dicts or objects with an `id`, ordered by ascending id.
+    limit: int
+        The page size.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary matching `CursorPaginatedListResponse`.
+    """
+    page = data[:limit]
+    next_cursor = None
+    if len(data) > limit and page:
+        last = page[-1]
+        next_cursor = encode_cursor(last["id"] if isinstance(last, dict) else last.id)
+
+    return {"data": page, "limit": limit, "next_cursor": next_cursor}
+
+
+async def cursor_paginate(
+    db: AsyncSession,
+    crud: FastCRUD,
+    cursor: str,
+    limit: int,
+    schema_to_select: type[BaseModel],
+    **kwargs: Any,
+) -> dict[str, Any]:
+    """Fetch one page of `crud`'s model in keyset mode, i.e. `WHERE id > :last_id ORDER BY id LIMIT :limit`.
+
+    Unlike `OFFSET`, the cost of a page does not depend on how deep it is.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session.
+    crud: FastCRUD
+        The CRUD of the model to page over. The model must have an integer `id` column.
+    cursor: str
+        The opaque cursor from the previous page, or an empty string for the first page.
+    limit: int
+        The page size, between 1 and `MAX_CURSOR_LIMIT`.
+    schema_to_select: type[BaseModel]
+        The schema whose fields are selected.
+    **kwargs: Any
+        Filters in the CRUD's filter syntax, e.g. `is_deleted=False`.
+
+    Returns
+    -------
+    dict[str, Any]
+        A dictionary matching `CursorPaginatedListResponse`.
+    """
+    if not 1 <= limit <= MAX_CURSOR_LIMIT:
+        raise BadRequestException(f"Limit must be between 1 and {MAX_CURSOR_LIMIT}")
+
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        kwargs["id__gt"] = last_id
+
+    model = crud.model
+    stmt = (
+        select(*[getattr(model, field) for field in schema_to_select.model_fields])
+        .where(*crud._parse_filters(**kwargs))
+        .order_by(model.id)
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).mappings().all()
+    return cursor_paginated_response([dict(row) for row in rows], limit)
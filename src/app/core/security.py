@@ -1,26 +1,44 @@
+import asyncio
+import time
 from datetime import UTC, datetime, timedelta
 from typing import Any, Literal
 
 import bcrypt
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..crud.crud_users import crud_users
 from .config import settings
 from .db.crud_token_blacklist import crud_token_blacklist
+from .db.database import local_session
+from .db.token_blacklist import TokenBlacklist
+from .exceptions.cache_exceptions import MissingClientError
+from .logger import logging
 from .schemas import TokenBlacklistCreate, TokenData
+from .utils import cache, password_hashing, pubsub, token_cache
+from .utils.bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
+BLACKLIST_BLOOM_CAPACITY = settings.TOKEN_BLACKLIST_BLOOM_CAPACITY
+BLACKLIST_BLOOM_ERROR_RATE = settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE
+BLACKLIST_BLOOM_REFRESH = settings.TOKEN_BLACKLIST_BLOOM_REFRESH
+BLACKLIST_AUDIT = settings.TOKEN_BLACKLIST_AUDIT
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
 
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
-    correct_password: bool = bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    correct_password: bool = await password_hashing.run(
+        bcrypt.checkpw, plain_password.encode(), hashed_password.encode()
+    )
     return correct_password
 
 
@@ -29,6 +47,25 @@ def get_password_hash(password: str) -> str:
     return hashed_password
 
 
+async def hash_password(password: str) -> str:
+    hashed_password: str = await password_hashing.run(get_password_hash, password)
+    return hashed_password
+
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    """Hash a batch of passwords in parallel on at most half of the hashing workers at a time.
+
+    Submitting the whole batch at once would fill the pool's queue and get logins rejected until it drains,
+    and using every worker would still make logins wait behind the batch.
+    """
+    concurrency = max(password_hashing.WORKERS // 2, 1)
+    hashed_passwords: list[str] = []
+    for start in range(0, len(passwords), concurrency):
+        batch = passwords[start : start + concurrency]
+        hashed_passwords.extend(await asyncio.gather(*(hash_password(password) for password in batch)))
+    return hashed_passwords
+
+
 async def authenticate_user(username_or_email: str, password: str, db: AsyncSession) -> dict[str, Any] | Literal[False]:
     if "@" in username_or_email:
         db_user: dict | None = await crud_users.get(db=db, email=username_or_email, is_deleted=False)
@@ -66,37 +103,216 @@ async def create_refresh_token(data: dict[str, Any], expires_delta: timedelta |
     return encoded_jwt
 
 
-async def verify_token(token: str, db: AsyncSession) -> TokenData | None:
+async def verify_token(token: str) -> TokenData | None:
     """Verify a JWT token and return TokenData if valid.
 
     Parameters
     ----------
     token: str
         The JWT token to be verified.
-    db: AsyncSession
-        Database session for performing database operations.
 
     Returns
     -------
     TokenData | None
         TokenData instance if the token is valid, None otherwise.
+
+    Note
+    ----
+        - Successful verifications are cached in-process by token digest, so hot tokens skip both the
+        blacklist lookup and the decode. Entries never outlive the token's `exp` and are dropped on every
+        worker when the token is blacklisted.
     """
-    is_blacklisted = await crud_token_blacklist.exists(db, token=token)
+    token_digest = token_cache.token_digest(token)
+    cached_token_data = token_cache.get(token_digest)
+    if cached_token_data is not None:
+        return cached_token_data
+
+    is_blacklisted = await is_token_blacklisted(token_digest)
     if is_blacklisted:
         return None
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username_or_email: str = payload.get("sub")
-        if username_or_email is None:
+        expires_at: float | None = payload.get("exp")
+        # every token issued here expires, one that does not was not issued by us
+        if username_or_email is None or expires_at is None:
             return None
-        return TokenData(username_or_email=username_or_email)
+        token_data = TokenData(username_or_email=username_or_email)
+        token_cache.put(token_digest, token_data, expires_at=expires_at)
+        return token_data
 
     except JWTError:
         return None
 
 
-async def blacklist_token(token: str, db: AsyncSession) -> None:
+async def blacklist_token(token: str) -> None:
     payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    expires_at = datetime.fromtimestamp(payload.get("exp"))
-    await crud_token_blacklist.create(db, object=TokenBlacklistCreate(**{"token": token, "expires_at": expires_at}))
+    if payload.get("exp") is None:
+        raise JWTError("Token has no expiration.")
+    token_digest = token_cache.token_digest(token)
+    await _store_blacklisted_digests({token_digest: payload.get("exp")})
+    await token_cache.revoke(token_digest)
+
+    if BLACKLIST_AUDIT:
+        expires_at = datetime.fromtimestamp(payload.get("exp"))
+        task = asyncio.create_task(_write_blacklist_audit(token, expires_at))
+        _audit_tasks.add(task)
+        task.add_done_callback(_audit_tasks.discard)
+
+
+# -------------- token blacklist --------------
+BLACKLIST_KEY_PREFIX = "token_blacklist"
+BLACKLIST_INDEX_KEY = f"{BLACKLIST_KEY_PREFIX}:index"
+
+blacklist_filter: BloomFilter | None = None
+blacklist_refresher: asyncio.Task | None = None
+_filter_generation = 0
+_reset_refreshes: set[asyncio.Task] = set()
+_recent_revocations: set[str] = set()
+_audit_tasks: set[asyncio.Task] = set()
+
+
+async def is_token_blacklisted(token_digest: str) -> bool:
+    """Check whether a token has been revoked.
+
+    Revoked tokens live in Redis with a TTL matching their remaining lifetime. A local Bloom filter
+    over all revoked digests sits in front of Redis, so the common "not revoked" case costs no I/O.
+
+    Parameters
+    ----------
+    token_digest: str
+        The token digest, see `token_cache.token_digest`.
+
+    Returns
+    -------
+    bool
+        True if the token has been revoked, False otherwise.
+    """
+    if blacklist_filter is not None and token_digest not in blacklist_filter:
+        return False
+
+    if cache.client is None:
+        raise MissingClientError
+
+    return bool(await cache.client.exists(f"{BLACKLIST_KEY_PREFIX}:{token_digest}"))
+
+
+async def _store_blacklisted_digests(expirations: dict[str, float]) -> None:
+    if cache.client is None:
+        raise MissingClientError
+
+    now = time.time()
+    expirations = {digest: exp for digest, exp in expirations.items() if exp > now}
+    if not expirations:
+        return
+
+    async with cache.client.pipeline(transaction=False) as pipe:
+        for digest, exp in expirations.items():
+            pipe.set(f"{BLACKLIST_KEY_PREFIX}:{digest}", 1, ex=int(exp - now) + 1)
+        pipe.zadd(BLACKLIST_INDEX_KEY, expirations)
+        await pipe.execute()
+
+
+async def _write_blacklist_audit(token: str, expires_at: datetime) -> None:
+    try:
+        async with local_session() as db:
+            await crud_token_blacklist.create(db, object=TokenBlacklistCreate(token=token, expires_at=expires_at))
+    except Exception as e:
+        logger.error(f"Failed to write token blacklist audit entry: {e}")
+
+
+async def _seed_blacklist_from_audit() -> None:
+    async with local_session() as db:
+        result = await db.execute(
+            select(TokenBlacklist.token, TokenBlacklist.expires_at).where(TokenBlacklist.expires_at > datetime.now())
+        )
+        rows = result.all()
+
+    await _store_blacklisted_digests({token_cache.token_digest(token): exp.timestamp() for token, exp in rows})
+
+
+async def _refresh_blacklist_filter_after_reset() -> None:
+    try:
+        await refresh_blacklist_filter()
+    except Exception as e:
+        logger.error(f"Failed to refresh token blacklist filter: {e}")
+
+
+def _on_token_revoked(token_digest: str | None) -> None:
+    global blacklist_filter, _filter_generation
+    if token_digest is None:
+        # revocations may have been missed: fall back to Redis until the filter is rebuilt, right away
+        blacklist_filter = None
+        _filter_generation += 1
+        task = asyncio.create_task(_refresh_blacklist_filter_after_reset())
+        _reset_refreshes.add(task)
+        task.add_done_callback(_reset_refreshes.discard)
+        return
+
+    _recent_revocations.add(token_digest)
+    if blacklist_filter is not None:
+        blacklist_filter.add(token_digest)
+
+
+async def refresh_blacklist_filter() -> None:
+    """Rebuild the local Bloom filter from the Redis index, pruning expired revocations on the way."""
+    global blacklist_filter
+    if cache.client is None:
+        raise MissingClientError
+
+    # a rebuild that started before a reset may have read an index missing the revocations it was about
+    loaded_at_generation = _filter_generation
+    _recent_revocations.clear()
+    async with cache.client.pipeline(transaction=False) as pipe:
+        pipe.zremrangebyscore(BLACKLIST_INDEX_KEY, "-inf", time.time())
+        pipe.zrange(BLACKLIST_INDEX_KEY, 0, -1)
+        _, digests = await pipe.execute()
+
+    new_filter = BloomFilter(max(len(digests) * 2, BLACKLIST_BLOOM_CAPACITY), BLACKLIST_BLOOM_ERROR_RATE)
+    for digest in digests:
+        new_filter.add(digest.decode())
+
+    # revocations received while the index was being read are not guaranteed to be in it
+    for digest in _recent_revocations:
+        new_filter.add(digest)
+
+    if loaded_at_generation == _filter_generation:
+        blacklist_filter = new_filter
+
+
+async def _refresh_blacklist_filter_periodically() -> None:
+    while True:
+        await asyncio.sleep(BLACKLIST_BLOOM_REFRESH)
+        try:
+            await refresh_blacklist_filter()
+        except Exception as e:
+            logger.error(f"Failed to refresh token blacklist filter: {e}")
+
+
+async def start_blacklist_refresher() -> None:
+    global blacklist_refresher
+    if cache.client is None:
+        raise MissingClientError
+
+    if BLACKLIST_AUDIT and not await cache.client.exists(BLACKLIST_INDEX_KEY):
+        await _seed_blacklist_from_audit()
+
+    await refresh_blacklist_filter()
+    blacklist_refresher = asyncio.create_task(_refresh_blacklist_filter_periodically())
+
+
+async def stop_blacklist_refresher() -> None:
+    global blacklist_refresher
+    if blacklist_refresher is None:
+        return
+
+    blacklist_refresher.cancel()
+    try:
+        await blacklist_refresher
+    except asyncio.CancelledError:
+        pass
+    blacklist_refresher = None
+
+
+pubsub.subscribe(token_cache.TOPIC, _on_token_revoked)
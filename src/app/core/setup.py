@@ -13,19 +13,33 @@ from fastapi.openapi.utils import get_openapi
 
 from ..api.dependencies import get_current_superuser
 from ..middleware.client_cache_middleware import ClientCacheMiddleware
+from ..middleware.compression_middleware import CompressionMiddleware
+from ..middleware.rate_limit_headers_middleware import RateLimitHeadersMiddleware
 from .config import (
     AppSettings,
     ClientSideCacheSettings,
+    CompressionSettings,
+    DatabasePoolSettings,
     DatabaseSettings,
     EnvironmentOption,
     EnvironmentSettings,
+    PasswordHashingSettings,
     RedisCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
+    TokenBlacklistSettings,
     settings,
 )
-from .db.database import Base, async_engine as engine
-from .utils import cache, queue, rate_limit
+from .db.database import (
+    Base,
+    async_engine as engine,
+    dispose_engines,
+    start_replica_health_checks,
+    stop_replica_health_checks,
+    warm_up_pool,
+)
+from .security import start_blacklist_refresher, stop_blacklist_refresher
+from .utils import cache, password_hashing, pubsub, queue, rate_limit
 from ..models import *
 
 # -------------- database --------------
@@ -44,6 +58,14 @@ async def close_redis_cache_pool() -> None:
     await cache.client.aclose()  # type: ignore
 
 
+async def start_invalidation_listener() -> None:
+    await pubsub.start_listener(cache.client)  # type: ignore
+
+
+async def stop_invalidation_listener() -> None:
+    await pubsub.stop_listener()
+
+
 # -------------- queue --------------
 async def create_redis_queue_pool() -> None:
     queue.pool = await create_pool(RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT))
@@ -57,9 +79,13 @@ async def close_redis_queue_pool() -> None:
 async def create_redis_rate_limit_pool() -> None:
     rate_limit.pool = redis.ConnectionPool.from_url(settings.REDIS_RATE_LIMIT_URL)
     rate_limit.client = redis.Redis.from_pool(rate_limit.pool)  # type: ignore
+    await rate_limit.load_scripts()
+    if settings.RATE_LIMIT_APPROXIMATE:
+        await rate_limit.start_flusher()
 
 
 async def close_redis_rate_limit_pool() -> None:
+    await rate_limit.stop_flusher()
     await rate_limit.client.aclose()  # type: ignore
 
 
@@ -90,8 +116,18 @@ def lifespan_factory(
         if isinstance(settings, DatabaseSettings) and create_tables_on_start:
             await create_tables()
 
+        if isinstance(settings, DatabasePoolSettings):
+            await warm_up_pool(settings.DATABASE_POOL_WARMUP_SIZE)
+
+        if isinstance(settings, DatabaseSettings):
+            await start_replica_health_checks()
+
         if isinstance(settings, RedisCacheSettings):
             await create_redis_cache_pool()
+            await start_invalidation_listener()
+
+            if isinstance(settings, TokenBlacklistSettings):
+                await start_blacklist_refresher()
 
         if isinstance(settings, RedisQueueSettings):
             await create_redis_queue_pool()
@@ -102,6 +138,10 @@ def lifespan_factory(
         yield
 
         if isinstance(settings, RedisCacheSettings):
+            if isinstance(settings, TokenBlacklistSettings):
+                await stop_blacklist_refresher()
+
+            await stop_invalidation_listener()
             await close_redis_cache_pool()
 
         if isinstance(settings, RedisQueueSettings):
@@ -110,6 +150,13 @@ def lifespan_factory(
         if isinstance(settings, RedisRateLimiterSettings):
             await close_redis_rate_limit_pool()
 
+        if isinstance(settings, PasswordHashingSettings):
+            password_hashing.shutdown()
+
+        if isinstance(settings, DatabaseSettings):
+            await stop_replica_health_checks()
+            await dispose_engines()
+
     return lifespan
 
 
@@ -143,11 +190,18 @@ def create_application(
         It determines the configuration applied:
 
         - AppSettings: Configures basic app metadata like name, description, contact, and license info.
-        - DatabaseSettings: Adds event handlers for initializing database tables during startup.
-        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool.
-        - ClientSideCacheSettings: Integrates middleware for client-side caching.
+        - DatabaseSettings: Adds event handlers for initializing database tables during startup, and for the
+          health checks of the read replicas in `POSTGRES_READ_REPLICA_URIS`.
+        - DatabasePoolSettings: Pre-opens database connections during startup.
+        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool, and for the
+          pub/sub listener that keeps in-process caches coherent across workers.
+        - TokenBlacklistSettings: Loads the token blacklist Bloom filter and keeps it refreshed (requires
+          RedisCacheSettings).
+        - ClientSideCacheSettings: Integrates middleware for client-side caching (`Cache-Control`, ETag and 304s).
+        - CompressionSettings: Integrates middleware for zstd, brotli and gzip response compression.
         - RedisQueueSettings: Sets up event handlers for creating and closing a Redis queue pool.
-        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool.
+        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool,
+          and integrates middleware for the `X-RateLimit-*` headers.
         - EnvironmentSettings: Conditionally sets documentation URLs and integrates custom routes for API documentation
           based on the environment type.
 
@@ -186,8 +240,28 @@ def create_application(
     application = FastAPI(lifespan=lifespan, **kwargs)
     application.include_router(router)
 
+    # compression is added first so that it runs inside the client cache middleware, which then sees the
+    # encoded body and gives every encoding its own ETag
+    if isinstance(settings, CompressionSettings):
+        application.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            content_types=settings.COMPRESSION_CONTENT_TYPES.split(","),
+            encodings=settings.COMPRESSION_ENCODINGS.split(","),
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+            zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+        )
+
     if isinstance(settings, ClientSideCacheSettings):
-        application.add_middleware(ClientCacheMiddleware, max_age=settings.CLIENT_CACHE_MAX_AGE)
+        application.add_middleware(
+            ClientCacheMiddleware,
+            max_age=settings.CLIENT_CACHE_MAX_AGE,
+            etag_max_bytes=settings.CLIENT_CACHE_ETAG_MAX_BYTES,
+        )
+
+    if isinstance(settings, RedisRateLimiterSettings):
+        application.add_middleware(RateLimitHeadersMiddleware)
 
     if isinstance(settings, EnvironmentSettings):
         if settings.ENVIRONMENT != EnvironmentOption.PRODUCTION:
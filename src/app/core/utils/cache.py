@@ -1,18 +1,78 @@
+import asyncio
 import functools
-import json
+import math
+import random
 import re
-from collections.abc import Callable
-from typing import Any
+import struct
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any, NamedTuple
 
 from fastapi import Request, Response
 from fastapi.encoders import jsonable_encoder
 from redis.asyncio import ConnectionPool, Redis
 
+from ...middleware.compression_middleware import parse_accept_encoding
+from ..config import settings
 from ..exceptions.cache_exceptions import CacheIdentificationInferenceError, InvalidRequestError, MissingClientError
+from ..logger import logging
+from . import pubsub
+from .cache_codecs import Codec, Compressor, codecs_by_id, compressors_by_id, get_codec, get_compressor
+from .local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
 
+TOPIC = "cache"
+
+# L1: in-process, kept coherent by broadcasting every deleted key over the invalidation channel
+local_cache = LocalCache(max_bytes=settings.REDIS_CACHE_L1_MAX_BYTES, max_ttl=settings.REDIS_CACHE_L1_TTL)
+_l1_hits = 0
+_l2_hits = 0
+_misses = 0
+
+DEFAULT_CODEC = settings.REDIS_CACHE_CODEC
+DEFAULT_COMPRESSION = settings.REDIS_CACHE_COMPRESSION
+COMPRESSION_THRESHOLD = settings.REDIS_CACHE_COMPRESSION_THRESHOLD
+
+# cached values start with a format version byte, followed by the codec and compressor ids,
+# the recompute time and the absolute expiry. Version 1 entries have no codec or compressor ids
+# and are plain json.
+_ENTRY_FORMAT = 2
+_ENTRY_HEADER = struct.Struct(">BBBdd")
+_LEGACY_ENTRY_FORMAT = 1
+_LEGACY_ENTRY_HEADER = struct.Struct(">Bdd")
+
+
+class CacheEntry(NamedTuple):
+    codec: Codec
+    compressor: Compressor
+    delta: float
+    expires_at: float
+    body: bytes
+
+LOCK_POLL_INTERVAL = 0.05
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Tag members are only ever touched through plain per-key commands, never from inside a script, so that
+# every key a command touches is declared and the cache also works behind key-routing proxies
+TAG_BATCH_SIZE = 1000
+# tag sets outlive the entries they list, so a sample of members is checked on some writes and expired ones dropped
+TAG_PRUNE_SAMPLE = 20
+TAG_PRUNE_PROBABILITY = 0.1
+_prune_tasks: set[asyncio.Task] = set()
+_GLOB_CHARACTERS = re.compile(r"[*?\[\]]")
+
+_in_flight: dict[str, asyncio.Future] = {}
+
 
 def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type | tuple[type, ...]) -> int | str:
     """Infer the resource ID from a dictionary of keyword arguments.
@@ -179,6 +239,348 @@ async def _delete_keys_by_pattern(pattern: str) -> None:
         cursor, keys = await client.scan(cursor, match=pattern, count=100)
         if keys:
             await client.delete(*keys)
+            await pubsub.publish_many(TOPIC, [key.decode() for key in keys])
+
+
+def _tag_key(tag: str) -> str:
+    return f"tag:{tag}"
+
+
+def _pattern_to_tag(pattern: str) -> str | None:
+    """Map a key pattern onto the tag of its key prefix, e.g. 'user:*' or 'user:' onto 'user'.
+
+    Returns None for patterns with wildcards before their end, which cannot be mapped onto a tag.
+    """
+    prefix = pattern.rstrip("*")
+    if not prefix or _GLOB_CHARACTERS.search(prefix):
+        return None
+
+    return prefix.rstrip(":")
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """Delete every cache entry registered under any of the given tags.
+
+    Parameters
+    ----------
+    *tags: str
+        The tags to invalidate. Every entry is tagged with its formatted key prefix, plus any
+        `tags` passed to the `cache` decorator.
+
+    Returns
+    -------
+    int
+        The number of live entries that were deleted.
+
+    Note
+    ----
+        - Unlike `_delete_keys_by_pattern`, the cost scales with the number of tagged entries,
+        not with the size of the keyspace: one round trip to read the tags, then one per
+        `TAG_BATCH_SIZE` entries.
+        - Only the members that were read are removed from the tag sets, so entries tagged
+        concurrently stay registered.
+    """
+    if client is None:
+        raise MissingClientError
+
+    if not tags:
+        return 0
+
+    tag_keys = [_tag_key(tag) for tag in tags]
+    async with client.pipeline(transaction=False) as pipe:
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        members_by_tag = dict(zip(tag_keys, await pipe.execute()))
+
+    members = list({member.decode() for tag_members in members_by_tag.values() for member in tag_members})
+    deleted_keys = []
+    for start in range(0, len(members), TAG_BATCH_SIZE):
+        batch = members[start : start + TAG_BATCH_SIZE]
+        async with client.pipeline(transaction=False) as pipe:
+            for key in batch:
+                pipe.unlink(key)
+            deleted_keys.extend(key for key, deleted in zip(batch, await pipe.execute()) if deleted)
+
+    async with client.pipeline(transaction=False) as pipe:
+        for tag_key, tag_members in members_by_tag.items():
+            tag_members = list(tag_members)
+            for start in range(0, len(tag_members), TAG_BATCH_SIZE):
+                pipe.srem(tag_key, *tag_members[start : start + TAG_BATCH_SIZE])
+        await pipe.execute()
+
+    await pubsub.publish_many(TOPIC, deleted_keys)
+    return len(deleted_keys)
+
+
+async def delete_keys(*keys: str) -> None:
+    """Delete cache entries from Redis and from the in-process tier of every worker."""
+    if client is None:
+        raise MissingClientError
+
+    await client.delete(*keys)
+    await pubsub.publish_many(TOPIC, keys)
+
+
+async def _get_entry(cache_key: str) -> bytes | None:
+    """Read an entry from the in-process tier, falling back to Redis."""
+    global _l1_hits, _l2_hits, _misses
+    if client is None:
+        raise MissingClientError
+
+    data = local_cache.get(cache_key)
+    if data is not None:
+        _l1_hits += 1
+        return data
+
+    data = await client.get(cache_key)
+    if data is None:
+        _misses += 1
+        return None
+
+    _l2_hits += 1
+    entry = _unpack_entry(data)
+    if entry is not None:
+        local_cache.set(cache_key, data, ttl=entry.expires_at - time.time())
+    return data
+
+
+def metrics() -> dict[str, Any]:
+    """Return hit counters and ratios of the in-process (L1) and Redis (L2) tiers."""
+    lookups = _l1_hits + _l2_hits + _misses
+    l2_lookups = _l2_hits + _misses
+    return {
+        "l1_hits": _l1_hits,
+        "l2_hits": _l2_hits,
+        "misses": _misses,
+        "l1_hit_ratio": _l1_hits / lookups if lookups else 0.0,
+        "l2_hit_ratio": _l2_hits / l2_lookups if l2_lookups else 0.0,
+        "l1_entries": len(local_cache),
+        "l1_bytes": local_cache.size,
+    }
+
+
+def _invalidate_local(cache_key: str | None) -> None:
+    if cache_key is None:
+        local_cache.clear()
+    else:
+        local_cache.delete(cache_key)
+
+
+async def _prune_tag(tag_key: str) -> None:
+    if client is None:
+        raise MissingClientError
+
+    try:
+        sample = [member.decode() for member in await client.srandmember(tag_key, TAG_PRUNE_SAMPLE)]
+        if not sample:
+            return
+
+        async with client.pipeline(transaction=False) as pipe:
+            for key in sample:
+                pipe.exists(key)
+            expired = [key for key, exists in zip(sample, await pipe.execute()) if not exists]
+        if expired:
+            await client.srem(tag_key, *expired)
+
+    except Exception as e:
+        logger.error(f"Failed to prune cache tag {tag_key}: {e}")
+
+
+async def _store_entry(cache_key: str, entry: bytes, expiration: int, tags: list[str]) -> None:
+    if client is None:
+        raise MissingClientError
+
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.set(cache_key, entry, ex=expiration)
+        for tag in tags:
+            tag_key = _tag_key(tag)
+            pipe.sadd(tag_key, cache_key)
+            # a tag set must live as long as its longest-lived member: set a TTL on new sets, then only extend it.
+            # EXPIRE NX and GT need Redis 7
+            pipe.expire(tag_key, expiration, nx=True)
+            pipe.expire(tag_key, expiration, gt=True)
+        await pipe.execute()
+
+    local_cache.set(cache_key, entry, ttl=expiration)
+
+    for tag in tags:
+        if random.random() < TAG_PRUNE_PROBABILITY:
+            task = asyncio.create_task(_prune_tag(_tag_key(tag)))
+            _prune_tasks.add(task)
+            task.add_done_callback(_prune_tasks.discard)
+
+
+def _pack_entry(
+    data: Any, codec: Codec, compressor: Compressor, delta: float, expiration: int
+) -> tuple[bytes, CacheEntry]:
+    """Serialize data into a cache value, compressing it if it is larger than `COMPRESSION_THRESHOLD`."""
+    body = codec.encode(data)
+    if len(body) < COMPRESSION_THRESHOLD:
+        compressor = get_compressor("none")
+    body = compressor.compress(body)
+
+    expires_at = time.time() + expiration
+    header = _ENTRY_HEADER.pack(_ENTRY_FORMAT, codec.id, compressor.id, delta, expires_at)
+    return header + body, CacheEntry(codec, compressor, delta, expires_at, body)
+
+
+def _unpack_entry(data: bytes) -> CacheEntry | None:
+    """Parse a cached value. Returns None for unknown formats, codecs or compressors, which count as a miss."""
+    if data[:1] == bytes([_ENTRY_FORMAT]) and len(data) >= _ENTRY_HEADER.size:
+        _, codec_id, compressor_id, delta, expires_at = _ENTRY_HEADER.unpack_from(data)
+        codec = codecs_by_id.get(codec_id)
+        compressor = compressors_by_id.get(compressor_id)
+        if codec is None or compressor is None:
+            return None
+        return CacheEntry(codec, compressor, delta, expires_at, data[_ENTRY_HEADER.size :])
+
+    if data[:1] == bytes([_LEGACY_ENTRY_FORMAT]) and len(data) >= _LEGACY_ENTRY_HEADER.size:
+        _, delta, expires_at = _LEGACY_ENTRY_HEADER.unpack_from(data)
+        body = data[_LEGACY_ENTRY_HEADER.size :]
+        return CacheEntry(get_codec("json"), get_compressor("none"), delta, expires_at, body)
+
+    return None
+
+
+def _should_refresh_early(delta: float, expires_at: float, beta: float) -> bool:
+    """Decide whether to recompute an entry before it expires (XFetch).
+
+    The probability grows as expiry approaches, and faster for entries that are slow to recompute,
+    so one request refreshes a popular key ahead of time instead of all of them at expiry.
+
+    Parameters
+    ----------
+    delta: float
+        The time the last recompute took, in seconds.
+    expires_at: float
+        The entry's expiry as a unix timestamp.
+    beta: float
+        Values above 1 favour earlier refreshes. 0 disables early refresh.
+    """
+    if beta <= 0:
+        return False
+
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+async def _acquire_lock(cache_key: str, lease: float) -> str | None:
+    if client is None:
+        raise MissingClientError
+
+    token = uuid.uuid4().hex
+    acquired = await client.set(f"lock:{cache_key}", token, nx=True, px=int(lease * 1000))
+    return token if acquired else None
+
+
+async def _release_lock(cache_key: str, token: str) -> None:
+    if client is None:
+        raise MissingClientError
+
+    await client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{cache_key}", token)
+
+
+async def _wait_for_fill(cache_key: str, lease: float) -> CacheEntry | None:
+    """Poll for a key being filled by another worker, for at most one lock lease."""
+    if client is None:
+        raise MissingClientError
+
+    deadline = time.monotonic() + lease
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = _unpack_entry(await client.get(cache_key) or b"")
+        if entry is not None:
+            return entry
+
+    return None
+
+
+async def _fill_single_flight(
+    cache_key: str,
+    compute: Callable[[], Awaitable[Any]],
+    codec: Codec,
+    compressor: Compressor,
+    expiration: int,
+    tags: list[str],
+    lock_timeout: float | None,
+    stale_entry: CacheEntry | None,
+) -> tuple[Any, CacheEntry]:
+    """Recompute a cache entry, making sure only one caller does so at a time.
+
+    Within a worker, concurrent callers for the same key share one in-flight future. Across workers,
+    an optional Redis lock with a short lease elects the one that recomputes, while the others serve
+    the stale entry if there is one, or wait for the fill.
+
+    Parameters
+    ----------
+    cache_key: str
+        The key being filled.
+    compute: Callable[[], Awaitable[Any]]
+        Calls the decorated endpoint.
+    codec: Codec
+        The codec to serialize the result with.
+    compressor: Compressor
+        The compressor to use if the serialized result is larger than `COMPRESSION_THRESHOLD`.
+    expiration: int
+        The entry's time to live in seconds.
+    tags: list[str]
+        The tags to register the entry under.
+    lock_timeout: float | None
+        The Redis lock lease in seconds, or None to only coalesce within this worker.
+    stale_entry: CacheEntry | None
+        The current entry when refreshing early, served to callers that do not recompute.
+
+    Returns
+    -------
+    tuple[Any, CacheEntry]
+        The endpoint's result, or None if it was not called by this caller, and the cache entry.
+    """
+    if client is None:
+        raise MissingClientError
+
+    while (in_flight := _in_flight.get(cache_key)) is not None:
+        if stale_entry is not None:
+            return None, stale_entry
+
+        try:
+            return None, await asyncio.shield(in_flight)
+        except asyncio.CancelledError:
+            # the recomputing caller went away, take over unless we were the one cancelled
+            if not in_flight.cancelled():
+                raise
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _in_flight[cache_key] = future
+    lock_token = None
+    try:
+        if lock_timeout is not None:
+            lock_token = await _acquire_lock(cache_key, lock_timeout)
+            if lock_token is None:
+                entry = stale_entry or await _wait_for_fill(cache_key, lock_timeout)
+                if entry is not None:
+                    future.set_result(entry)
+                    return None, entry
+
+        start = time.perf_counter()
+        result = await compute()
+        value, entry = _pack_entry(
+            jsonable_encoder(result), codec, compressor, delta=time.perf_counter() - start, expiration=expiration
+        )
+        await _store_entry(cache_key, value, expiration, tags)
+        future.set_result(entry)
+        return result, entry
+
+    except Exception as e:
+        future.set_exception(e)
+        # mark the exception as retrieved, waiters re-raise it on their own
+        future.exception()
+        raise
+
+    finally:
+        if not future.done():
+            future.cancel()
+        _in_flight.pop(cache_key, None)
+        if lock_token is not None:
+            await _release_lock(cache_key, lock_token)
 
 
 def cache(
@@ -188,6 +590,12 @@ def cache(
     resource_id_type: type | tuple[type, ...] = int,
     to_invalidate_extra: dict[str, Any] | None = None,
     pattern_to_invalidate_extra: list[str] | None = None,
+    return_raw: bool = False,
+    tags: list[str] | None = None,
+    lock_timeout: float | None = None,
+    early_refresh_beta: float = 1.0,
+    codec: str | None = None,
+    compression: str | None = None,
 ) -> Callable:
     """Cache decorator for FastAPI endpoints.
 
@@ -212,7 +620,29 @@ def cache(
         These keys are invalidated when the decorated function is called with a method other than GET.
     pattern_to_invalidate_extra: List[str] | None, optional
         A list of string patterns for cache keys that should be invalidated when the decorated function is called.
-        This allows for bulk invalidation of cache keys based on a matching pattern.
+        This allows for bulk invalidation of cache keys based on a matching pattern. A pattern that is a key prefix
+        optionally followed by ':' or '*' (e.g. 'user:') invalidates the tag of that prefix; other patterns fall back
+        to scanning the keyspace.
+    return_raw: bool, default False
+        If True, cache hits return the cached JSON bytes directly as a `Response`, without deserializing them.
+        Entries compressed with gzip or zstd are sent as is, with a `Content-Encoding`, to clients that accept it.
+        The response then bypasses the route's `response_model`, so the decorated function should already
+        return data shaped like it.
+    tags: List[str] | None, optional
+        Extra tags, which may use the same templates as `key_prefix`, to register cached entries under. Entries are
+        always registered under their formatted key prefix. See `invalidate_tags`.
+    lock_timeout: float | None, optional
+        If set, a miss takes a Redis lock with this lease (in seconds) so only one worker in the cluster recomputes
+        the entry. Concurrent misses within a worker are always coalesced.
+    early_refresh_beta: float, default 1.0
+        Controls probabilistic early refresh (XFetch): entries are recomputed shortly before they expire, with a
+        probability that grows with how long they took to compute. Set to 0 to disable.
+    codec: str | None, optional
+        The codec cached payloads are serialized with: 'json', 'orjson' or 'msgpack'. Defaults to
+        `REDIS_CACHE_CODEC`. Each entry records its codec, so changing it is safe during a rolling deploy.
+    compression: str | None, optional
+        The compression applied to payloads above `REDIS_CACHE_COMPRESSION_THRESHOLD` bytes: 'none', 'gzip', 'zstd'
+        or 'lz4'. Defaults to `REDIS_CACHE_COMPRESSION`.
 
     Returns
     -------
@@ -279,10 +709,33 @@ def cache(
     ----
     - resource_id_type is used only if resource_id is not passed.
     - `to_invalidate_extra` and `pattern_to_invalidate_extra` are used for cache invalidation on methods other than GET.
-    - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets. Use it judiciously and
-      consider the potential impact on Redis performance.
+    - Patterns in `pattern_to_invalidate_extra` that map onto a tag cost one round trip proportional to the number
+      of tagged entries. Patterns with inner wildcards scan the whole keyspace, which can be resource-intensive on
+      large datasets. Use them judiciously and consider the potential impact on Redis performance.
+    - A cache fill is a single `SET ... EX`, and all keys invalidated by a call are removed with a single `DEL`.
+    - Entries are served from an in-process L1 tier before Redis. Every key deleted by the decorator is broadcast
+      over the invalidation channel, so all workers drop it from L1 as well.
+    - Concurrent misses for a key run the endpoint once per worker (or once per cluster with `lock_timeout`),
+      the other callers get the same payload.
     """
 
+    entry_codec = get_codec(codec or DEFAULT_CODEC)
+    entry_compressor = get_compressor(compression or DEFAULT_COMPRESSION)
+
+    def _cached_response(entry: CacheEntry, request: Request) -> Any:
+        if return_raw and entry.codec.is_json:
+            encoding = entry.compressor.content_encoding
+            if encoding and parse_accept_encoding(request.headers.get("accept-encoding", "")).get(encoding, 0) > 0:
+                # the entry is already compressed in the wire format the client accepts
+                return Response(
+                    content=entry.body,
+                    media_type="application/json",
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+                )
+            return Response(content=entry.compressor.decompress(entry.body), media_type="application/json")
+
+        return entry.codec.decode(entry.compressor.decompress(entry.body))
+
     def wrapper(func: Callable) -> Callable:
         @functools.wraps(func)
         async def inner(request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -300,36 +753,52 @@ def cache(
                 if to_invalidate_extra is not None or pattern_to_invalidate_extra is not None:
                     raise InvalidRequestError
 
-                cached_data = await client.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data.decode())
+                stale_entry = None
+                entry = _unpack_entry(await _get_entry(cache_key) or b"")
+                if entry is not None:
+                    if not _should_refresh_early(entry.delta, entry.expires_at, early_refresh_beta):
+                        return _cached_response(entry, request)
+                    stale_entry = entry
+
+                entry_tags = [formatted_key_prefix, *[_format_prefix(tag, kwargs) for tag in tags or []]]
+                result, entry = await _fill_single_flight(
+                    cache_key,
+                    lambda: func(request, *args, **kwargs),
+                    codec=entry_codec,
+                    compressor=entry_compressor,
+                    expiration=expiration,
+                    tags=entry_tags,
+                    lock_timeout=lock_timeout,
+                    stale_entry=stale_entry,
+                )
+                if result is None:
+                    return _cached_response(entry, request)
+                return result
 
             result = await func(request, *args, **kwargs)
 
-            if request.method == "GET":
-                serializable_data = jsonable_encoder(result)
-                serialized_data = json.dumps(serializable_data)
-
-                await client.set(cache_key, serialized_data)
-                await client.expire(cache_key, expiration)
-
-                serialized_data = json.loads(serialized_data)
-
-            else:
-                await client.delete(cache_key)
-                if to_invalidate_extra is not None:
-                    formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
-                    for prefix, id in formatted_extra.items():
-                        extra_cache_key = f"{prefix}:{id}"
-                        await client.delete(extra_cache_key)
-
-                if pattern_to_invalidate_extra is not None:
-                    for pattern in pattern_to_invalidate_extra:
-                        formatted_pattern = _format_prefix(pattern, kwargs)
+            keys_to_delete = [cache_key]
+            if to_invalidate_extra is not None:
+                formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
+                keys_to_delete.extend(f"{prefix}:{id}" for prefix, id in formatted_extra.items())
+            await delete_keys(*keys_to_delete)
+
+            if pattern_to_invalidate_extra is not None:
+                tags_to_invalidate = []
+                for pattern in pattern_to_invalidate_extra:
+                    formatted_pattern = _format_prefix(pattern, kwargs)
+                    tag = _pattern_to_tag(formatted_pattern)
+                    if tag is not None:
+                        tags_to_invalidate.append(tag)
+                    else:
                         await _delete_keys_by_pattern(formatted_pattern + "*")
+                await invalidate_tags(*tags_to_invalidate)
 
             return result
 
         return inner
 
     return wrapper
+
+
+pubsub.subscribe(TOPIC, _invalidate_local)
@@ -0,0 +1,172 @@
+import gzip
+import json
+import zlib
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+
+class Codec:
+    """Serializes cached payloads. `id` is stored in every entry's header and must never be reused."""
+
+    id: int
+    name: str
+    is_json: bool = False
+
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    id = 1
+    name = "json"
+    is_json = True
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    id = 2
+    name = "orjson"
+    is_json = True
+
+    def encode(self, data: Any) -> bytes:
+        encoded: bytes = orjson.dumps(data)
+        return encoded
+
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    id = 3
+    name = "msgpack"
+
+    def encode(self, data: Any) -> bytes:
+        encoded: bytes = msgpack.packb(data, use_bin_type=True)
+        return encoded
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class Compressor:
+    """Compresses cached payloads. `id` is stored in every entry's header and must never be reused.
+
+    `content_encoding` is the HTTP `Content-Encoding` whose wire format the compressed bytes use, if any.
+    """
+
+    id: int
+    name: str
+    content_encoding: str | None = None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class NoCompressor(Compressor):
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class GzipCompressor(Compressor):
+    id = 1
+    name = "gzip"
+    content_encoding = "gzip"
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=6, mtime=0)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data, wbits=31)
+
+
+class ZstdCompressor(Compressor):
+    id = 2
+    name = "zstd"
+    content_encoding = "zstd"
+
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.compress(data)
+        return compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressed: bytes = self._decompressor.decompress(data)
+        return decompressed
+
+
+class Lz4Compressor(Compressor):
+    id = 3
+    name = "lz4"
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = lz4_frame.compress(data)
+        return compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressed: bytes = lz4_frame.decompress(data)
+        return decompressed
+
+
+codecs: dict[str, Codec] = {"json": JsonCodec()}
+if orjson is not None:
+    codecs["orjson"] = OrjsonCodec()
+if msgpack is not None:
+    codecs["msgpack"] = MsgpackCodec()
+
+compressors: dict[str, Compressor] = {"none": NoCompressor(), "gzip": GzipCompressor()}
+if zstandard is not None:
+    compressors["zstd"] = ZstdCompressor()
+if lz4_frame is not None:
+    compressors["lz4"] = Lz4Compressor()
+
+codecs_by_id: dict[int, Codec] = {codec.id: codec for codec in codecs.values()}
+compressors_by_id: dict[int, Compressor] = {compressor.id: compressor for compressor in compressors.values()}
+
+
+def get_codec(name: str) -> Codec:
+    """Return an available codec by name, falling back to stdlib json if its library is not installed."""
+    return codecs.get(name, codecs["json"])
+
+
+def get_compressor(name: str) -> Compressor:
+    """Return an available compressor by name, falling back to no compression if its library is not installed."""
+    return compressors.get(name, compressors["none"])
@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+
+
+class _LocalCacheEntry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: bytes, expires_at: float) -> None:
+        self.value = value
+        self.expires_at = expires_at
+
+
+class LocalCache:
+    """An in-process LRU cache of byte strings, bounded by total size, with a TTL per entry.
+
+    Parameters
+    ----------
+    max_bytes: int
+        The total size of the cached values above which least recently used entries are evicted.
+    max_ttl: float
+        The upper bound for any entry's time to live, in seconds.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.size = 0
+        self._entries: OrderedDict[str, _LocalCacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.delete(key)
+        if len(value) > self.max_bytes or ttl <= 0:
+            return
+
+        self._entries[key] = _LocalCacheEntry(value, time.monotonic() + min(ttl, self.max_ttl))
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.value)
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,114 @@
+import json
+import time
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.master_data import MasterData
+from ...schemas.master_data import MasterDataRead
+from ..config import settings
+from ..exceptions.cache_exceptions import MissingClientError
+from . import cache, pubsub
+
+TOPIC = "master_data"
+KEY_PREFIX = "master_data"
+LOCAL_TTL = settings.MASTER_DATA_CACHE_LOCAL_TTL
+SNAPSHOT_TTL = settings.MASTER_DATA_CACHE_SNAPSHOT_TTL
+
+_snapshots: dict[str, tuple[float, int, list[dict[str, Any]]]] = {}
+_generation = 0
+
+
+def _version_key(code: str) -> str:
+    return f"{KEY_PREFIX}:version:{code}"
+
+
+def _snapshot_key(code: str, version: int) -> str:
+    return f"{KEY_PREFIX}:snapshot:{code}:{version}"
+
+
+async def _load_snapshot(db: AsyncSession, code: str) -> list[dict[str, Any]]:
+    stmt = (
+        select(*[getattr(MasterData, field) for field in MasterDataRead.model_fields])
+        .where(MasterData.code == code, MasterData.is_deleted == False)  # noqa: E712
+        .order_by(MasterData.id)
+    )
+    rows = (await db.execute(stmt)).mappings().all()
+    return [dict(row) for row in rows]
+
+
+async def get_snapshot(db: AsyncSession, code: str) -> list[dict[str, Any]]:
+    """Return every non-deleted master data item of a type code.
+
+    Snapshots are kept in process and in Redis under a key versioned per code. A fresh in-process
+    snapshot is returned without any I/O, a stale one is revalidated against the version in Redis,
+    and the database is only read when no snapshot exists for the current version.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        Database session, only used on a full miss.
+    code: str
+        The `MasterDataType.code` of the items.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        The items, shaped like `MasterDataRead` and ordered by id.
+    """
+    now = time.monotonic()
+    entry = _snapshots.get(code)
+    if entry is not None and now - entry[0] < LOCAL_TTL:
+        return entry[2]
+
+    if cache.client is None:
+        raise MissingClientError
+
+    # an invalidation received while we are loading means the loaded items may predate it
+    loaded_at_generation = _generation
+    version = int(await cache.client.get(_version_key(code)) or 0)
+    if entry is not None and entry[1] == version and loaded_at_generation == _generation:
+        _snapshots[code] = (now, version, entry[2])
+        return entry[2]
+
+    snapshot_key = _snapshot_key(code, version)
+    cached_snapshot = await cache.client.get(snapshot_key)
+    if cached_snapshot is not None:
+        items = json.loads(cached_snapshot)
+    else:
+        items = await _load_snapshot(db, code)
+        await cache.client.set(snapshot_key, json.dumps(items), ex=SNAPSHOT_TTL, nx=True)
+
+    if loaded_at_generation == _generation:
+        _snapshots[code] = (now, version, items)
+    return items
+
+
+async def bump_version(*codes: str) -> None:
+    """Invalidate the snapshots of the given type codes everywhere. Call it after the change is committed."""
+    if cache.client is None:
+        raise MissingClientError
+
+    codes = tuple(set(codes))
+    async with cache.client.pipeline(transaction=False) as pipe:
+        for code in codes:
+            pipe.incr(_version_key(code))
+        await pipe.execute()
+
+    for code in codes:
+        await pubsub.publish(TOPIC, code)
+
+
+def invalidate(code: str | None) -> None:
+    """Drop the in-process snapshot of a code, or every snapshot when `code` is None."""
+    global _generation
+    _generation += 1
+
+    if code is None:
+        _snapshots.clear()
+    else:
+        _snapshots.pop(code, None)
+
+
+pubsub.subscribe(TOPIC, invalidate)
@@ -0,0 +1,264 @@
+import asyncio
+import csv
+import os
+import time
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from io import TextIOWrapper
+from typing import Any, Literal
+
+import orjson
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from sqlalchemy import select, text
+
+from ...models.master_data import MasterData
+from ...models.master_data_type import MasterDataType
+from ...schemas.master_data import MasterDataBase
+from ..config import settings
+from ..db.database import async_engine, local_session
+from ..logger import logging
+from . import cache, master_data_cache
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["ndjson", "csv"]
+
+UPLOAD_DIR = settings.MASTER_DATA_IMPORT_DIR
+CHUNK_SIZE = settings.MASTER_DATA_IMPORT_CHUNK_SIZE
+PROGRESS_TTL = settings.MASTER_DATA_IMPORT_PROGRESS_TTL
+STATEMENT_TIMEOUT_MS = settings.MASTER_DATA_IMPORT_STATEMENT_TIMEOUT_MS
+MAX_REPORTED_ERRORS = 100
+
+STAGING_TABLE = "master_data_import_staging"
+STAGING_COLUMNS = ["line", "code", "name", "value", "data"]
+# the schema allows longer values than the column holds, which would make the COPY of the whole chunk fail
+VALUE_MAX_LENGTH = MasterData.__table__.c.value.type.length
+
+# temporary tables are private to the connection and never written to the WAL
+_CREATE_STAGING_TABLE = (
+    f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+    "(line integer NOT NULL, code varchar(30) NOT NULL, name varchar(30) NOT NULL, "
+    f"value varchar({VALUE_MAX_LENGTH}), data jsonb)"
+)
+
+# Rows are matched on the name of a live master data, the last line wins when a name appears more than once.
+# Joining `previous` on the updated row gives its code before the update, whose snapshot must be invalidated too.
+_UPSERT_FROM_STAGING = text(
+    f"""
+    WITH incoming AS (
+        SELECT DISTINCT ON (name) code, name, value, data
+        FROM {STAGING_TABLE}
+        ORDER BY name, line DESC
+    ),
+    updated AS (
+        UPDATE master_data AS target
+        SET code = incoming.code, value = incoming.value, data = incoming.data::json,
+            updated_at = :now, updated_by = :user_id
+        FROM incoming, master_data AS previous
+        WHERE target.name = incoming.name AND target.is_deleted = false AND previous.id = target.id
+        RETURNING target.name, target.code, previous.code AS previous_code
+    ),
+    inserted AS (
+        INSERT INTO master_data (code, name, value, data, is_deleted, created_at, updated_at, created_by, updated_by)
+        SELECT incoming.code, incoming.name, incoming.value, incoming.data::json, false, :now, :now, :user_id, :user_id
+        FROM incoming
+        WHERE NOT EXISTS (SELECT 1 FROM updated WHERE updated.name = incoming.name)
+        RETURNING code
+    )
+    SELECT
+        (SELECT count(*) FROM updated) AS updated,
+        (SELECT count(*) FROM inserted) AS inserted,
+        ARRAY(
+            SELECT code FROM updated UNION SELECT previous_code FROM updated UNION SELECT code FROM inserted
+        ) AS codes
+    """
+)
+
+
+def progress_key(import_id: str) -> str:
+    return f"master_data_import:{import_id}"
+
+
+def upload_path(import_id: str, format: ImportFormat) -> str:
+    return os.path.join(UPLOAD_DIR, f"{import_id}.{format}")
+
+
+async def set_progress(redis: Redis, import_id: str, **fields: Any) -> None:
+    key = progress_key(import_id)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping={name: orjson.dumps(value) for name, value in fields.items()})
+        pipe.expire(key, PROGRESS_TTL)
+        await pipe.execute()
+
+
+async def get_progress(redis: Redis, import_id: str) -> dict[str, Any] | None:
+    fields = await redis.hgetall(progress_key(import_id))
+    if not fields:
+        return None
+    return {name.decode(): orjson.loads(value) for name, value in fields.items()}
+
+
+def _parse_rows(file: TextIOWrapper, format: ImportFormat) -> Iterator[tuple[int, Any]]:
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield line_num, e
+
+
+def _read_chunks(path: str, format: ImportFormat) -> Iterator[list[tuple[int, Any]]]:
+    """Yield the upload's rows `CHUNK_SIZE` at a time, as (line number, parsed row or parsing error) pairs."""
+    with open(path, newline="", encoding="utf-8") as file:
+        chunk = []
+        for line_num, row in _parse_rows(file, format):
+            chunk.append((line_num, row))
+            if len(chunk) >= CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _validate_chunk(
+    chunk: list[tuple[int, Any]], valid_codes: set[str]
+) -> tuple[list[tuple[Any, ...]], list[dict[str, Any]]]:
+    records = []
+    errors = []
+    for line, row in chunk:
+        if not isinstance(row, dict):
+            errors.append({"line": line, "detail": f"Invalid row: {row}"})
+            continue
+
+        if isinstance(row.get("data"), str):
+            try:
+                row["data"] = orjson.loads(row["data"]) if row["data"] else None
+            except orjson.JSONDecodeError:
+                errors.append({"line": line, "detail": "Invalid JSON in data"})
+                continue
+        if row.get("value") == "":
+            row["value"] = None
+
+        try:
+            item = MasterDataBase.model_validate(row)
+        except ValidationError as e:
+            errors.append({"line": line, "detail": "; ".join(error["msg"] for error in e.errors())})
+            continue
+
+        if item.value is not None and len(item.value) > VALUE_MAX_LENGTH:
+            errors.append({"line": line, "detail": f"Value must be at most {VALUE_MAX_LENGTH} characters"})
+            continue
+
+        if item.code not in valid_codes:
+            errors.append({"line": line, "detail": "Master data type code not found"})
+            continue
+
+        data = orjson.dumps(item.data).decode() if item.data is not None else None
+        records.append((line, item.code, item.name, item.value, data))
+    return records, errors
+
+
+async def run_import(redis: Redis, import_id: str, format: ImportFormat, user_id: int) -> dict[str, Any]:
+    """Load an uploaded CSV or NDJSON file of master data, then upsert it in a single statement.
+
+    The upload is parsed and validated `MASTER_DATA_IMPORT_CHUNK_SIZE` rows at a time against the type codes
+    loaded up front, and each valid chunk is copied into a temporary staging table. No transaction is held
+    while the file is read: only the final upsert, matched on the name of live master data, runs in one.
+    Progress is written to a Redis hash after every chunk.
+
+    Parameters
+    ----------
+    redis: Redis
+        The client progress is written with.
+    import_id: str
+        The id of the import, which names its upload and its progress hash.
+    format: ImportFormat
+        'csv' with a header row, or 'ndjson'. Columns are those of `MasterDataBase`.
+    user_id: int
+        The user recorded as creator and updater of the rows.
+
+    Returns
+    -------
+    dict[str, Any]
+        The final progress of the import.
+    """
+    path = upload_path(import_id, format)
+    progress: dict[str, Any] = {
+        "status": "running",
+        "rows_read": 0,
+        "rows_rejected": 0,
+        "rows_staged": 0,
+        "rows_inserted": 0,
+        "rows_updated": 0,
+        "errors": [],
+        "started_at": time.time(),
+    }
+    await set_progress(redis, import_id, **progress)
+
+    try:
+        if not await asyncio.to_thread(os.path.exists, path):
+            raise FileNotFoundError(
+                f"Upload {path} not found, MASTER_DATA_IMPORT_DIR must be shared between the API and the worker"
+            )
+
+        async with local_session() as db:
+            valid_codes = set((await db.scalars(select(MasterDataType.code))).all())
+
+        async with async_engine.connect() as connection:
+            raw_connection = await connection.get_raw_connection()
+            asyncpg_connection = raw_connection.driver_connection
+            await asyncpg_connection.execute(_CREATE_STAGING_TABLE)
+            try:
+                await asyncpg_connection.execute(f"TRUNCATE {STAGING_TABLE}")
+
+                chunks = _read_chunks(path, format)
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    records, errors = _validate_chunk(chunk, valid_codes)
+                    if records:
+                        await asyncpg_connection.copy_records_to_table(
+                            STAGING_TABLE, records=records, columns=STAGING_COLUMNS
+                        )
+
+                    progress["rows_read"] += len(chunk)
+                    progress["rows_rejected"] += len(errors)
+                    progress["rows_staged"] += len(records)
+                    progress["errors"] = (progress["errors"] + errors)[:MAX_REPORTED_ERRORS]
+                    await set_progress(redis, import_id, **progress)
+
+                await set_progress(redis, import_id, status="upserting")
+                await connection.execute(text(f"SET LOCAL statement_timeout = {int(STATEMENT_TIMEOUT_MS)}"))
+                result = await connection.execute(
+                    _UPSERT_FROM_STAGING, {"now": datetime.now(UTC).replace(tzinfo=None), "user_id": user_id}
+                )
+                updated, inserted, codes = result.one()
+                await connection.commit()
+
+            finally:
+                # the connection goes back to the pool, so the table must not outlive a failed job
+                await connection.rollback()
+                await asyncpg_connection.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+        if updated:
+            await cache.invalidate_tags("master_data_item")
+        if codes:
+            await master_data_cache.bump_version(*codes)
+
+        progress.update(status="completed", rows_inserted=inserted, rows_updated=updated, finished_at=time.time())
+
+    except Exception as e:
+        logger.exception(f"Master data import {import_id} failed: {e}")
+        progress.update(status="failed", detail=str(e), finished_at=time.time())
+
+    finally:
+        await asyncio.to_thread(lambda: os.path.exists(path) and os.remove(path))
+
+    await set_progress(redis, import_id, **progress)
+    return progress
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from ..config import settings
+from ..exceptions.http_exceptions import ServiceUnavailableException
+
+T = TypeVar("T")
+
+WORKERS = settings.PASSWORD_HASH_WORKERS
+MAX_QUEUE = settings.PASSWORD_HASH_MAX_QUEUE
+
+executor: ThreadPoolExecutor | None = None
+
+_in_flight = 0
+_max_queue_depth = 0
+_completed = 0
+_rejected = 0
+_latency_total = 0.0
+_latency_max = 0.0
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="password-hashing")
+    return executor
+
+
+async def run(func: Callable[..., T], *args: Any) -> T:
+    """Run a bcrypt call on the dedicated hashing pool instead of the event loop.
+
+    bcrypt releases the GIL while hashing, so a thread pool gives real parallelism without
+    the pickling overhead of a process pool.
+
+    Parameters
+    ----------
+    func: Callable[..., T]
+        The blocking function to run, e.g. `bcrypt.checkpw`.
+    *args: Any
+        Positional arguments for `func`.
+
+    Returns
+    -------
+    T
+        The return value of `func`.
+
+    Raises
+    ------
+    ServiceUnavailableException
+        If more than `PASSWORD_HASH_MAX_QUEUE` calls are already waiting for a worker.
+    """
+    global _in_flight, _max_queue_depth, _completed, _rejected, _latency_total, _latency_max
+    if _in_flight >= WORKERS + MAX_QUEUE:
+        _rejected += 1
+        raise ServiceUnavailableException("Too many concurrent password operations, please retry.")
+
+    _in_flight += 1
+    _max_queue_depth = max(_max_queue_depth, _in_flight - WORKERS)
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+    finally:
+        latency = time.perf_counter() - start
+        _in_flight -= 1
+        _completed += 1
+        _latency_total += latency
+        _latency_max = max(_latency_max, latency)
+
+
+def metrics() -> dict[str, Any]:
+    """Return a snapshot of the hashing pool's counters. Latencies include time spent queued."""
+    return {
+        "workers": WORKERS,
+        "max_queue": MAX_QUEUE,
+        "in_flight": _in_flight,
+        "queue_depth": max(_in_flight - WORKERS, 0),
+        "max_queue_depth": _max_queue_depth,
+        "completed": _completed,
+        "rejected": _rejected,
+        "latency_avg_ms": (_latency_total / _completed * 1000) if _completed else 0.0,
+        "latency_max_ms": _latency_max * 1000,
+    }
+
+
+def shutdown() -> None:
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+from ..config import settings
+from . import pubsub
+
+TOPIC = "principal"
+MAX_SIZE = settings.PRINCIPAL_CACHE_MAX_SIZE
+TTL = settings.PRINCIPAL_CACHE_TTL
+
+_entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+_keys_by_user_id: dict[int, set[str]] = {}
+_generation = 0
+
+
+def generation() -> int:
+    """Return a counter that changes on every invalidation.
+
+    Read it before loading a user from the database and pass it to `put`, so a row loaded
+    before a concurrent update is never cached after that update's invalidation.
+    """
+    return _generation
+
+
+def get(username_or_email: str) -> dict[str, Any] | None:
+    """Return a copy of the cached user row for a token subject, or None on a miss or expired entry."""
+    entry = _entries.get(username_or_email)
+    if entry is None:
+        return None
+
+    deadline, user = entry
+    if deadline <= time.monotonic():
+        _evict(username_or_email)
+        return None
+
+    _entries.move_to_end(username_or_email)
+    return dict(user)
+
+
+def put(username_or_email: str, user: dict[str, Any], loaded_at_generation: int) -> None:
+    """Cache a user row under its token subject.
+
+    Parameters
+    ----------
+    username_or_email: str
+        The token subject the row was looked up by.
+    user: dict[str, Any]
+        The user row.
+    loaded_at_generation: int
+        The value of `generation()` read before the row was loaded. The row is discarded if
+        anything was invalidated since.
+    """
+    if loaded_at_generation != _generation:
+        return
+
+    _entries[username_or_email] = (time.monotonic() + TTL, dict(user))
+    _entries.move_to_end(username_or_email)
+    _keys_by_user_id.setdefault(user["id"], set()).add(username_or_email)
+    while len(_entries) > MAX_SIZE:
+        oldest, _ = next(iter(_entries.items()))
+        _evict(oldest)
+
+
+def _evict(username_or_email: str) -> None:
+    entry = _entries.pop(username_or_email, None)
+    if entry is None:
+        return
+
+    user_id = entry[1]["id"]
+    keys = _keys_by_user_id.get(user_id)
+    if keys is not None:
+        keys.discard(username_or_email)
+        if not keys:
+            del _keys_by_user_id[user_id]
+
+
+def invalidate(user_id: str | None) -> None:
+    """Drop every entry of a user, or every entry when `user_id` is None."""
+    global _generation
+    _generation += 1
+
+    if user_id is None:
+        _entries.clear()
+        _keys_by_user_id.clear()
+        return
+
+    for username_or_email in list(_keys_by_user_id.get(int(user_id), ())):
+        _evict(username_or_email)
+
+
+async def revoke(user_id: int) -> None:
+    """Drop a user from the cache on every worker. Call it after any change to the user or their roles."""
+    await pubsub.publish(TOPIC, str(user_id))
+
+
+pubsub.subscribe(TOPIC, invalidate)
@@ -0,0 +1,129 @@
+import asyncio
+from collections.abc import Callable, Iterable
+
+from redis.asyncio import Redis
+
+from ...core.logger import logging
+from ..config import settings
+from ..exceptions.cache_exceptions import MissingClientError
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = settings.REDIS_CACHE_INVALIDATION_CHANNEL
+RECONNECT_DELAY = 1.0
+
+client: Redis | None = None
+listener: asyncio.Task | None = None
+_handlers: dict[str, list[Callable[[str | None], None]]] = {}
+
+
+def subscribe(topic: str, handler: Callable[[str | None], None]) -> None:
+    """Register a handler for invalidation messages published under a topic.
+
+    Parameters
+    ----------
+    topic: str
+        The topic name, e.g. 'token'. Must not contain ':'.
+    handler: Callable[[str | None], None]
+        Called with the invalidated key. Called with None when messages may have been lost
+        (e.g. after a reconnect), in which case the handler must drop all of its local state.
+    """
+    _handlers.setdefault(topic, []).append(handler)
+
+
+def _dispatch(topic: str, key: str | None) -> None:
+    for handler in _handlers.get(topic, []):
+        try:
+            handler(key)
+        except Exception as e:
+            logger.exception(f"Invalidation handler for topic '{topic}' failed: {e}")
+
+
+def _reset_all() -> None:
+    for topic in _handlers:
+        _dispatch(topic, None)
+
+
+async def publish(topic: str, key: str) -> None:
+    """Invalidate a key on this worker immediately and broadcast the invalidation to every other worker.
+
+    Parameters
+    ----------
+    topic: str
+        The topic the key belongs to.
+    key: str
+        The key to invalidate.
+
+    Note
+    ----
+        - Local handlers run before the message is published, so the calling worker never serves
+        stale state even if Redis is unreachable. The message echoes back to this worker as well,
+        which is harmless since invalidation is idempotent.
+    """
+    await publish_many(topic, [key])
+
+
+async def publish_many(topic: str, keys: Iterable[str]) -> None:
+    """Like `publish`, for several keys at once, in a single round trip."""
+    keys = list(keys)
+    for key in keys:
+        _dispatch(topic, key)
+
+    if client is None:
+        raise MissingClientError
+
+    if not keys:
+        return
+
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.publish(CHANNEL, f"{topic}:{key}")
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to publish {len(keys)} invalidation(s) for topic '{topic}': {e}")
+
+
+async def _listen() -> None:
+    while True:
+        if client is None:
+            raise MissingClientError
+
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CHANNEL)
+            # anything published while we were not subscribed is lost, so start from a clean slate
+            _reset_all()
+            async for message in pubsub.listen():
+                topic, _, key = message["data"].decode().partition(":")
+                _dispatch(topic, key)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.error(f"Invalidation listener disconnected, retrying in {RECONNECT_DELAY}s: {e}")
+            _reset_all()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+        finally:
+            await pubsub.aclose()
+
+
+async def start_listener(redis_client: Redis) -> None:
+    global client, listener
+    client = redis_client
+    listener = asyncio.create_task(_listen())
+
+
+async def stop_listener() -> None:
+    global listener
+    if listener is None:
+        return
+
+    listener.cancel()
+    try:
+        await listener
+    except asyncio.CancelledError:
+        pass
+    listener = None
@@ -1,38 +1,318 @@
-from datetime import UTC, datetime
+import asyncio
+import math
+import time
+import uuid
+from typing import NamedTuple
 
 from redis.asyncio import ConnectionPool, Redis
+from redis.commands.core import AsyncScript
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...core.logger import logging
 from ...schemas.rate_limit import sanitize_path
+from ..config import RateLimitAlgorithm, settings
 
 logger = logging.getLogger(__name__)
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
 
+DEFAULT_ALGORITHM = settings.DEFAULT_RATE_LIMIT_ALGORITHM
+APPROXIMATE = settings.RATE_LIMIT_APPROXIMATE
+FLUSH_INTERVAL = settings.RATE_LIMIT_FLUSH_INTERVAL_MS / 1000
+RESERVE_FRACTION = settings.RATE_LIMIT_RESERVE_FRACTION
 
-async def is_rate_limited(db: AsyncSession, user_id: int, path: str, limit: int, period: int) -> bool:
+# Every script returns {allowed, remaining, reset}, with reset in microseconds. The sliding window and GCRA
+# scripts read the clock from Redis so that workers with skewed clocks still agree on the window.
+_FIXED_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local count = redis.call('INCRBY', KEYS[1], ARGV[4] or 1)
+if redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+local reset = redis.call('PTTL', KEYS[1]) * 1000
+if count > limit then
+    return {0, 0, reset}
+end
+return {1, limit - count, reset}
+"""
+
+_SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2]) * 1000000
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], math.ceil(window / 1000))
+    count = count + 1
+    allowed = 1
+end
+local reset = 0
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, limit - count, reset}
+"""
+
+_GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2]) * 1000000
+local interval = period / limit
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], string.format('%d', math.ceil(new_tat)), 'PX', math.ceil(period / 1000))
+return {1, math.floor((now - allow_at) / interval), math.ceil(new_tat - now)}
+"""
+
+_SCRIPT_SOURCES = {
+    RateLimitAlgorithm.FIXED_WINDOW: _FIXED_WINDOW_SCRIPT,
+    RateLimitAlgorithm.SLIDING_WINDOW: _SLIDING_WINDOW_SCRIPT,
+    RateLimitAlgorithm.GCRA: _GCRA_SCRIPT,
+}
+_scripts: dict[RateLimitAlgorithm, AsyncScript] = {}
+
+
+class _LocalCounter:
+    """Requests counted by this worker for one fixed window and not yet flushed to Redis."""
+
+    __slots__ = ("limit", "period", "window_end", "known", "budget", "pending")
+
+    def __init__(self, limit: int, period: int, window_end: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.window_end = window_end
+        self.known = 0
+        self.budget = 0
+        self.pending = 0
+
+    def synced(self, allowed: bool, remaining: int) -> None:
+        self.known = self.limit - remaining if allowed else self.limit
+        self.budget = int((self.limit - self.known) * RESERVE_FRACTION)
+
+
+_local_counters: dict[str, _LocalCounter] = {}
+flusher: asyncio.Task | None = None
+
+
+class RateLimitResult(NamedTuple):
+    """The outcome of a rate limit check. `reset` is the number of seconds until the window resets,
+    or until the next request is allowed if this one was denied."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float
+
+
+async def load_scripts() -> None:
+    """Register the rate limit scripts and load them into Redis, so that every check is a single EVALSHA."""
+    if client is None:
+        logger.error("Redis client is not initialized.")
+        raise Exception("Redis client is not initialized.")
+
+    for algorithm, source in _SCRIPT_SOURCES.items():
+        _scripts[algorithm] = client.register_script(source)
+        await client.script_load(source)
+
+
+def _window_start(period: int) -> int:
+    current_timestamp = int(time.time())
+    return current_timestamp - (current_timestamp % period)
+
+
+def _rate_limit_key(algorithm: RateLimitAlgorithm, user_id: int | str, path: str, period: int) -> str:
+    key = f"ratelimit:{algorithm.value}:{user_id}:{sanitize_path(path)}"
+    if algorithm is RateLimitAlgorithm.FIXED_WINDOW:
+        key = f"{key}:{_window_start(period)}"
+    return key
+
+
+def _get_script(algorithm: RateLimitAlgorithm) -> AsyncScript:
+    if client is None:
+        logger.error("Redis client is not initialized.")
+        raise Exception("Redis client is not initialized.")
+
+    script = _scripts.get(algorithm)
+    if script is None:
+        script = _scripts[algorithm] = client.register_script(_SCRIPT_SOURCES[algorithm])
+    return script
+
+
+async def _check_approximate(key: str, limit: int, period: int) -> RateLimitResult:
+    """Count a request in this worker's fixed window counter, going to Redis only once the local budget is spent.
+
+    The budget is a fraction of the capacity left as of the last sync with Redis, so it shrinks to zero as
+    the user gets close to the limit, at which point every request is checked synchronously again.
+    """
+    counter = _local_counters.get(key)
+    if counter is None:
+        counter = _local_counters[key] = _LocalCounter(limit, period, window_end=_window_start(period) + period)
+
+    if counter.pending < counter.budget:
+        counter.pending += 1
+        remaining = max(limit - counter.known - counter.pending, 0)
+        return RateLimitResult(allowed=True, limit=limit, remaining=remaining, reset=counter.window_end - time.time())
+
+    increment = counter.pending + 1
+    counter.pending = 0
+    try:
+        allowed, remaining, reset = await _get_script(RateLimitAlgorithm.FIXED_WINDOW)(
+            keys=[key], args=[limit, period, "", increment]
+        )
+    except Exception:
+        counter.pending += increment - 1
+        raise
+
+    counter.synced(bool(allowed), remaining)
+    return RateLimitResult(allowed=bool(allowed), limit=limit, remaining=max(remaining, 0), reset=reset / 1_000_000)
+
+
+async def flush_local_counters() -> None:
+    """Send the requests counted locally since the last flush to Redis, in a single pipeline."""
     if client is None:
         logger.error("Redis client is not initialized.")
         raise Exception("Redis client is not initialized.")
 
-    current_timestamp = int(datetime.now(UTC).timestamp())
-    window_start = current_timestamp - (current_timestamp % period)
+    now = time.time()
+    for key in [key for key, counter in _local_counters.items() if counter.window_end <= now]:
+        del _local_counters[key]
 
-    sanitized_path = sanitize_path(path)
-    key = f"ratelimit:{user_id}:{sanitized_path}:{window_start}"
+    to_flush = [(key, counter, counter.pending) for key, counter in _local_counters.items() if counter.pending]
+    if not to_flush:
+        return
+
+    script = _get_script(RateLimitAlgorithm.FIXED_WINDOW)
+    for _, counter, increment in to_flush:
+        counter.pending -= increment
 
     try:
-        current_count = await client.incr(key)
-        if current_count == 1:
-            await client.expire(key, period)
+        async with client.pipeline(transaction=False) as pipe:
+            for key, counter, increment in to_flush:
+                await script(keys=[key], args=[counter.limit, counter.period, "", increment], client=pipe)
+            results = await pipe.execute()
+
+    except Exception as e:
+        logger.error(f"Failed to flush {len(to_flush)} rate limit counter(s): {e}")
+        for _, counter, increment in to_flush:
+            counter.pending += increment
+        return
+
+    for (_, counter, _), (allowed, remaining, _) in zip(to_flush, results):
+        counter.synced(bool(allowed), remaining)
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await flush_local_counters()
+        except Exception as e:
+            logger.error(f"Failed to flush rate limit counters: {e}")
+
+
+async def start_flusher() -> None:
+    global flusher
+    flusher = asyncio.create_task(_flush_periodically())
 
-        if current_count > limit:
-            return True
+
+async def stop_flusher() -> None:
+    global flusher
+    if flusher is None:
+        return
+
+    flusher.cancel()
+    try:
+        await flusher
+    except asyncio.CancelledError:
+        pass
+    flusher = None
+    await flush_local_counters()
+
+
+async def check_rate_limit(
+    user_id: int | str,
+    path: str,
+    limit: int,
+    period: int,
+    algorithm: RateLimitAlgorithm = DEFAULT_ALGORITHM,
+) -> RateLimitResult:
+    """Count a request against a rate limit and decide whether it is allowed, in a single round trip.
+
+    Parameters
+    ----------
+    user_id: int | str
+        The user the request is counted for, or another identifier such as the client's IP address.
+    path: str
+        The request path.
+    limit: int
+        The number of requests allowed per period.
+    period: int
+        The period in seconds.
+    algorithm: RateLimitAlgorithm
+        - FIXED_WINDOW counts requests per aligned window, allowing up to twice the limit across a window boundary.
+        - SLIDING_WINDOW keeps the timestamp of each request in the last period. Exact, but uses memory per request.
+        - GCRA (generic cell rate algorithm) is a token bucket that stores a single timestamp per key and refills
+        one request every `period / limit` seconds.
+
+    Returns
+    -------
+    RateLimitResult
+        Whether the request is allowed, and the values for the `X-RateLimit-*` headers.
+
+    Note
+    ----
+        - Denied requests are not counted by the sliding window and GCRA algorithms, so a client that keeps
+        retrying is let through as soon as capacity frees up.
+        - With `RATE_LIMIT_APPROXIMATE`, fixed window checks are counted locally and flushed to Redis every
+        `RATE_LIMIT_FLUSH_INTERVAL_MS`. Users far from their limit then cost no Redis call, at the price of
+        letting up to about `RATE_LIMIT_RESERVE_FRACTION` of the remaining capacity through per worker between
+        flushes.
+    """
+    key = _rate_limit_key(algorithm, user_id, path, period)
+    if APPROXIMATE and algorithm is RateLimitAlgorithm.FIXED_WINDOW:
+        try:
+            return await _check_approximate(key, limit, period)
+        except Exception as e:
+            logger.exception(f"Error checking rate limit for user {user_id} on path {path}: {e}")
+            raise e
+
+    script = _get_script(algorithm)
+    try:
+        allowed, remaining, reset = await script(keys=[key], args=[limit, period, uuid.uuid4().hex])
 
     except Exception as e:
         logger.exception(f"Error checking rate limit for user {user_id} on path {path}: {e}")
         raise e
 
-    return False
+    return RateLimitResult(allowed=bool(allowed), limit=limit, remaining=max(remaining, 0), reset=reset / 1_000_000)
+
+
+def rate_limit_headers(result: RateLimitResult) -> dict[str, str]:
+    """Build the `X-RateLimit-*` headers for a result, plus `Retry-After` if the request was denied."""
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(result.reset)),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(math.ceil(result.reset))
+    return headers
+
+
+async def is_rate_limited(db: AsyncSession, user_id: int, path: str, limit: int, period: int) -> bool:
+    result = await check_rate_limit(user_id=user_id, path=path, limit=limit, period=period)
+    return not result.allowed
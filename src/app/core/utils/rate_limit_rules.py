@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from ...models.rate_limit import RateLimit
+from ..config import settings
+from ..db.database import local_session
+from . import pubsub
+
+TOPIC = "rate_limit_rule"
+TTL = settings.RATE_LIMIT_RULES_TTL
+
+_rules: dict[tuple[int, str], tuple[int, int]] = {}
+_loaded_at = float("-inf")
+_generation = 0
+_refresh_lock = asyncio.Lock()
+
+
+async def _load_rules() -> dict[tuple[int, str], tuple[int, int]]:
+    async with local_session() as db:
+        result = await db.execute(select(RateLimit.tier_id, RateLimit.path, RateLimit.limit, RateLimit.period))
+        return {(tier_id, path): (limit, period) for tier_id, path, limit, period in result.all()}
+
+
+async def _refresh() -> None:
+    global _rules, _loaded_at
+    async with _refresh_lock:
+        if time.monotonic() - _loaded_at < TTL:
+            return
+
+        # a change published while we are loading means the loaded rules may predate it
+        loaded_at_generation = _generation
+        rules = await _load_rules()
+        _rules = rules
+        if loaded_at_generation == _generation:
+            _loaded_at = time.monotonic()
+
+
+async def get_rule(tier_id: int, path: str) -> tuple[int, int] | None:
+    """Return the `(limit, period)` configured for a tier and a sanitized path, or None if there is none.
+
+    Every `RateLimit` row is kept in an in-process index that is reloaded at most every
+    `RATE_LIMIT_RULES_TTL` seconds, or right after `notify_changed` is called on any worker.
+    """
+    if time.monotonic() - _loaded_at >= TTL:
+        await _refresh()
+
+    return _rules.get((tier_id, path))
+
+
+async def notify_changed() -> None:
+    """Make every worker reload the rules on its next lookup. Call it after rules are committed."""
+    await pubsub.publish(TOPIC, "all")
+
+
+def invalidate(key: str | None) -> None:
+    global _loaded_at, _generation
+    _generation += 1
+    _loaded_at = float("-inf")
+
+
+pubsub.subscribe(TOPIC, invalidate)
@@ -0,0 +1,68 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from ..config import settings
+from ..schemas import TokenData
+from . import pubsub
+
+TOPIC = "token"
+MAX_SIZE = settings.TOKEN_CACHE_MAX_SIZE
+TTL = settings.TOKEN_CACHE_TTL
+
+_entries: OrderedDict[str, tuple[float, TokenData]] = OrderedDict()
+
+
+def token_digest(token: str) -> str:
+    """Return the cache key for a token, so raw tokens are never kept in memory or sent over the wire."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get(digest: str) -> TokenData | None:
+    """Return the cached verification result for a token digest, or None on a miss or expired entry."""
+    entry = _entries.get(digest)
+    if entry is None:
+        return None
+
+    deadline, token_data = entry
+    if deadline <= time.time():
+        _entries.pop(digest, None)
+        return None
+
+    _entries.move_to_end(digest)
+    return token_data
+
+
+def put(digest: str, token_data: TokenData, expires_at: float) -> None:
+    """Cache a successful verification until TTL elapses or the token expires, whichever is first.
+
+    Parameters
+    ----------
+    digest: str
+        The token digest, see `token_digest`.
+    token_data: TokenData
+        The verified token data.
+    expires_at: float
+        The token's `exp` claim as a unix timestamp.
+    """
+    deadline = min(time.time() + TTL, expires_at)
+    _entries[digest] = (deadline, token_data)
+    _entries.move_to_end(digest)
+    while len(_entries) > MAX_SIZE:
+        _entries.popitem(last=False)
+
+
+def invalidate(digest: str | None) -> None:
+    """Drop a single entry, or every entry when `digest` is None."""
+    if digest is None:
+        _entries.clear()
+    else:
+        _entries.pop(digest, None)
+
+
+async def revoke(digest: str) -> None:
+    """Drop a token from the cache on every worker."""
+    await pubsub.publish(TOPIC, digest)
+
+
+pubsub.subscribe(TOPIC, invalidate)
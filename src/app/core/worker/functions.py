@@ -1,9 +1,14 @@
 import asyncio
 import logging
 
+import redis.asyncio as redis
 import uvloop
 from arq.worker import Worker
 
+from ..config import settings
+from ..utils import cache, pubsub
+from ..utils.master_data_import import ImportFormat, run_import
+
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -15,10 +20,19 @@ async def sample_background_task(ctx: Worker, name: str) -> str:
     return f"Task {name} is complete!"
 
 
+async def import_master_data(ctx: Worker, import_id: str, format: ImportFormat, user_id: int) -> dict:
+    return await run_import(ctx["redis"], import_id, format, user_id)
+
+
 # -------- base functions --------
 async def startup(ctx: Worker) -> None:
+    # jobs invalidate API caches, which needs the cache client but not the invalidation listener
+    cache.pool = redis.ConnectionPool.from_url(settings.REDIS_CACHE_URL)
+    cache.client = redis.Redis.from_pool(cache.pool)  # type: ignore
+    pubsub.client = cache.client
     logging.info("Worker Started")
 
 
 async def shutdown(ctx: Worker) -> None:
+    await cache.client.aclose()  # type: ignore
     logging.info("Worker end")
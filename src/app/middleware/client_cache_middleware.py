@@ -1,56 +1,166 @@
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+import hashlib
+from collections.abc import Callable
+from typing import Any, TypeVar
 
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class ClientCacheMiddleware(BaseHTTPMiddleware):
-    """Middleware to set the `Cache-Control` header for client-side caching on all responses.
+F = TypeVar("F", bound=Callable[..., Any])
+
+_POLICY_ATTRIBUTE = "__client_cache_policy__"
+_NOT_MODIFIED_DROPPED_HEADERS = ("content-length", "content-type", "content-encoding")
+
+
+def client_cache(max_age: int | None = None, public: bool = True) -> Callable[[F], F]:
+    """Set the client-side caching policy of a GET endpoint.
 
     Parameters
     ----------
-    app: FastAPI
-        The FastAPI application instance.
-    max_age: int, optional
-        Duration (in seconds) for which the response should be cached. Defaults to 60 seconds.
+    max_age: int | None, optional
+        Duration (in seconds) for which clients may reuse the response without revalidating it.
+        Defaults to the middleware's `max_age`. Use 0 to make clients revalidate on every request.
+    public: bool, optional
+        Whether shared caches (e.g. proxies) may store the response. Responses to requests carrying an
+        `Authorization` header are always private. Defaults to True.
 
-    Attributes
-    ----------
-    max_age: int
-        Duration (in seconds) for which the response should be cached.
+    Note
+    ----
+        - GET endpoints without a policy are served with `no-cache`, so clients always revalidate them
+        with their ETag.
+    """
+
+    def wrapper(func: F) -> F:
+        setattr(func, _POLICY_ATTRIBUTE, (max_age, public))
+        return func
 
-    Methods
-    -------
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        Process the request and set the `Cache-Control` header in the response.
+    return wrapper
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+class ClientCacheMiddleware:
+    """Middleware to set the `Cache-Control` and `ETag` headers for client-side caching.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application.
+    max_age: int, optional
+        Default duration (in seconds) for which responses of endpoints decorated with `client_cache`
+        may be cached. Defaults to 60 seconds.
+    etag_max_bytes: int, optional
+        Largest response body an ETag is computed for, since the body has to be held back until it is
+        hashed. Defaults to 1 MiB.
 
     Note
     ----
-        - The `Cache-Control` header instructs clients (e.g., browsers)
-        to cache the response for the specified duration.
+        - Responses to non-GET requests get `no-store`.
+        - Successful GET responses get a strong ETag, the hash of the body computed as it is streamed
+        by the endpoint. A request whose `If-None-Match` matches it gets a 304 with no body.
+        - A `Cache-Control` or `ETag` header set by the endpoint itself is kept as is.
     """
 
-    def __init__(self, app: FastAPI, max_age: int = 60) -> None:
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, max_age: int = 60, etag_max_bytes: int = 1024 * 1024) -> None:
+        self.app = app
         self.max_age = max_age
+        self.etag_max_bytes = etag_max_bytes
+
+    def _cache_control(self, scope: Scope, request_headers: Headers) -> str:
+        if scope["method"] not in ("GET", "HEAD"):
+            return "no-store"
+
+        policy = getattr(scope.get("endpoint"), _POLICY_ATTRIBUTE, None)
+        max_age, public = policy if policy is not None else (0, True)
+        if max_age is None:
+            max_age = self.max_age
+
+        visibility = "public" if public and "authorization" not in request_headers else "private"
+        return f"{visibility}, max-age={max_age}" if max_age > 0 else f"{visibility}, no-cache"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        is_get = scope["method"] in ("GET", "HEAD")
+
+        start_message: Message | None = None
+        body_chunks: list[bytes] = []
+        body_size = 0
+        hasher = hashlib.blake2b(digest_size=16)
+        passthrough = False
+        not_modified = False
+
+        async def send_not_modified(message: Message) -> None:
+            headers = MutableHeaders(scope=message)
+            for name in _NOT_MODIFIED_DROPPED_HEADERS:
+                del headers[name]
+            await send({**message, "status": 304})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send_with_cache_headers(message: Message) -> None:
+            nonlocal start_message, body_size, passthrough, not_modified
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    # the endpoint is only known once the request has been routed
+                    headers["Cache-Control"] = self._cache_control(scope, request_headers)
+
+                if not is_get or message["status"] != 200:
+                    passthrough = True
+                elif "etag" in headers:
+                    passthrough = True
+                    if if_none_match and _etag_matches(if_none_match, headers["etag"]):
+                        not_modified = True
+                        await send_not_modified(message)
+                        return
+                elif int(headers.get("content-length", 0)) > self.etag_max_bytes:
+                    passthrough = True
+
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if not_modified:
+                return
+
+            if passthrough or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            hasher.update(body)
+            body_chunks.append(body)
+            body_size += len(body)
+
+            if body_size > self.etag_max_bytes:
+                passthrough = True
+                await send(start_message)
+                await send({"type": "http.response.body", "body": b"".join(body_chunks), "more_body": more_body})
+                return
+
+            if more_body:
+                return
+
+            etag = f'"{hasher.hexdigest()}"'
+            MutableHeaders(scope=start_message)["ETag"] = etag
+            if if_none_match and _etag_matches(if_none_match, etag):
+                await send_not_modified(start_message)
+                return
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": b"".join(body_chunks)})
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        """Process the request and set the `Cache-Control` header in the response.
-
-        Parameters
-        ----------
-        request: Request
-            The incoming request.
-        call_next: RequestResponseEndpoint
-            The next middleware or route handler in the processing chain.
-
-        Returns
-        -------
-        Response
-            The response object with the `Cache-Control` header set.
-
-        Note
-        ----
-            - This method is automatically called by Starlette for processing the request-response cycle.
-        """
-        response: Response = await call_next(request)
-        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
-        return response
+        await self.app(scope, receive, send_with_cache_headers)
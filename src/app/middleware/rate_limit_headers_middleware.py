@@ -0,0 +1,36 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RateLimitHeadersMiddleware:
+    """Middleware to add the `X-RateLimit-*` headers computed by the `rate_limiter` dependency to responses.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The ASGI application.
+
+    Note
+    ----
+        - The headers are read from `request.state.rate_limit_headers` when the response starts, so they are
+        also set on responses the endpoint returns directly (e.g. cached raw responses) and on 429 errors.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                rate_limit_headers = scope.get("state", {}).get("rate_limit_headers")
+                if rate_limit_headers:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *[(name.lower().encode(), value.encode()) for name, value in rate_limit_headers.items()],
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
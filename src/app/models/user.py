@@ -40,4 +40,5 @@ class User(Base):
     created_by: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     updated_by: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
     is_deleted: Mapped[bool] = mapped_column(default=False)
+    tier_id: Mapped[int | None] = mapped_column(ForeignKey("tier.id"), index=True, default=None)
 
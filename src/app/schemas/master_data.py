@@ -44,4 +44,63 @@ class MasterDataUpdateInternal(UserUpdatedBy, MasterDataUpdate):
 
 class MasterDataDelete(DeletedTimestamp):
     model_config = ConfigDict(extra="forbid")
-    
\ No newline at end of file
+    
+
+MASTER_DATA_BULK_MAX_ITEMS = 5000
+
+
+class MasterDataBulkCreate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: Annotated[list[MasterDataCreate], Field(min_length=1, max_length=MASTER_DATA_BULK_MAX_ITEMS)]
+
+
+class MasterDataBulkUpdateItem(MasterDataUpdate):
+    id: int
+
+
+class MasterDataBulkUpdate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: Annotated[list[MasterDataBulkUpdateItem], Field(min_length=1, max_length=MASTER_DATA_BULK_MAX_ITEMS)]
+
+
+class MasterDataBulkDelete(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    ids: Annotated[list[int], Field(min_length=1, max_length=MASTER_DATA_BULK_MAX_ITEMS)]
+
+
+class MasterDataBulkError(BaseModel):
+    index: int
+    id: int | None = None
+    detail: str
+
+
+class MasterDataBulkCreateResult(BaseModel):
+    data: list[MasterDataRead]
+    errors: list[MasterDataBulkError]
+
+
+class MasterDataBulkResult(BaseModel):
+    ids: list[int]
+    errors: list[MasterDataBulkError]
+
+
+class MasterDataImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class MasterDataImportStatus(BaseModel):
+    import_id: str
+    status: Annotated[str, Field(examples=["queued", "running", "upserting", "completed", "failed"])]
+    rows_read: int = 0
+    rows_rejected: int = 0
+    rows_staged: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    errors: list[MasterDataImportError] = []
+    detail: str | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
@@ -8,6 +8,9 @@ from sqlalchemy import Date
 from ..core.schemas import CreatedTimestamp, UpdatedTimestamp, DeletedTimestamp, UserCreateBy, UserUpdatedBy
 from ..schemas.role import RoleRead
 
+# every item costs a bcrypt hash, which the request waits for, so batches are kept small
+USER_BULK_MAX_ITEMS = 100
+
 
 class UserBase(BaseModel):
     name: Annotated[str, Field(min_length=2, max_length=30, examples=["User Userson"])]
@@ -53,6 +56,22 @@ class UserCreateInternal(UserBase):
     hashed_password: str
 
 
+class UserBulkCreate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: Annotated[list[UserCreate], Field(min_length=1, max_length=USER_BULK_MAX_ITEMS)]
+
+
+class UserBulkError(BaseModel):
+    index: int
+    detail: str
+
+
+class UserBulkCreateResult(BaseModel):
+    data: list[UserReadSub]
+    errors: list[UserBulkError]
+
+
 class UserUpdate(UpdatedTimestamp, UserBase):
     model_config = ConfigDict(extra="forbid")
 
@@ -0,0 +1,70 @@
+"""v1.5
+
+Revision ID: b14bc240c0a0
+Revises: 55691588f826
+Create Date: 2026-10-18 10:12:04.118392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b14bc240c0a0'
+down_revision: Union[str, None] = '55691588f826'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the tables may already exist, created on startup from the models, so the ones created here are marked
+# with this comment and only those are dropped on downgrade
+CREATED_HERE = f'created by revision {revision}'
+
+
+def _created_here(inspector: sa.Inspector, table: str) -> bool:
+    return table in inspector.get_table_names() and inspector.get_table_comment(table).get('text') == CREATED_HERE
+
+
+def upgrade() -> None:
+    existing_tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'tier' not in existing_tables:
+        op.create_table(
+            'tier',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('name', sa.String(), nullable=False, unique=True),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+            sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True),
+            comment=CREATED_HERE,
+        )
+
+    if 'rate_limit' not in existing_tables:
+        op.create_table(
+            'rate_limit',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('tier_id', sa.Integer(), nullable=False, index=True),
+            sa.Column('name', sa.String(), nullable=False, unique=True),
+            sa.Column('path', sa.String(), nullable=False),
+            sa.Column('limit', sa.Integer(), nullable=False),
+            sa.Column('period', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+            sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['tier_id'], ['tier.id']),
+            comment=CREATED_HERE,
+        )
+
+    op.add_column('user', sa.Column('tier_id', sa.Integer(), nullable=True))
+    op.create_index('ix_user_tier_id', 'user', ['tier_id'])
+    op.create_foreign_key('user_tier_id_fkey', 'user', 'tier', ['tier_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('user_tier_id_fkey', 'user', type_='foreignkey')
+    op.drop_index('ix_user_tier_id', 'user')
+    op.drop_column('user', 'tier_id')
+
+    inspector = sa.inspect(op.get_bind())
+    for table in ('rate_limit', 'tier'):
+        if _created_here(inspector, table):
+            op.drop_table(table)
@@ -1,16 +1,28 @@
 import asyncio
 import logging
 
+import redis.asyncio as redis
 from sqlalchemy import select
 
-from ..app.core.config import config
+from ..app.core.config import config, settings
 from ..app.core.db.database import AsyncSession, local_session
+from ..app.core.utils import pubsub, rate_limit_rules
 from ..app.models.tier import Tier
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def notify_rules_changed() -> None:
+    # running API workers keep the rate limit rules in memory until told to reload them
+    pubsub.client = redis.Redis.from_url(settings.REDIS_CACHE_URL)
+    try:
+        await rate_limit_rules.notify_changed()
+    finally:
+        await pubsub.client.aclose()
+        pubsub.client = None
+
+
 async def create_first_tier(session: AsyncSession) -> None:
     try:
         tier_name = config("TIER_NAME", default="free")
@@ -22,6 +34,7 @@ async def create_first_tier(session: AsyncSession) -> None:
         if tier is None:
             session.add(Tier(name=tier_name))
             await session.commit()
+            await notify_rules_changed()
             logger.info(f"Tier '{tier_name}' created successfully.")
 
         else:
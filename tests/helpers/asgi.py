@@ -0,0 +1,39 @@
+import asyncio
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def make_app(chunks: list[bytes], status: int = 200, headers: list[tuple[bytes, bytes]] | None = None) -> ASGIApp:
+    """Build an ASGI app that answers every request with a JSON response streamed as `chunks`."""
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        response_headers = [(b"content-type", b"application/json"), *(headers or [])]
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    return app
+
+
+def call(app: ASGIApp, method: str = "GET", headers: dict[str, str] | None = None) -> list[Message]:
+    """Send a single HTTP request through `app` and return the messages it sent."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def body_of(messages: list[Message]) -> bytes:
+    return b"".join(message.get("body", b"") for message in messages[1:])
@@ -0,0 +1,19 @@
+import pytest
+
+from src.app.core.utils.cache_codecs import codecs, compressors, get_codec, get_compressor
+
+PAYLOAD = {"id": 1, "name": "Item", "tags": ["a", "b"] * 500, "price": 9.5, "parent": None}
+
+
+@pytest.mark.parametrize("codec_name", list(codecs))
+@pytest.mark.parametrize("compressor_name", list(compressors))
+def test_codec_and_compressor_round_trip(codec_name: str, compressor_name: str) -> None:
+    codec = get_codec(codec_name)
+    compressor = get_compressor(compressor_name)
+
+    assert codec.decode(compressor.decompress(compressor.compress(codec.encode(PAYLOAD)))) == PAYLOAD
+
+
+def test_unavailable_codec_falls_back_to_json() -> None:
+    assert get_codec("unknown").name == "json"
+    assert get_compressor("unknown").name == "none"
@@ -0,0 +1,66 @@
+from starlette.datastructures import Headers
+
+from src.app.middleware.client_cache_middleware import ClientCacheMiddleware
+from tests.helpers.asgi import body_of, call, make_app
+
+
+def test_matching_if_none_match_gets_a_304() -> None:
+    middleware = ClientCacheMiddleware(make_app([b'{"id":', b"1}"]))
+    first = call(middleware)
+    etag = Headers(raw=first[0]["headers"])["etag"]
+
+    assert first[0]["status"] == 200
+    assert body_of(first) == b'{"id":1}'
+
+    second = call(middleware, headers={"If-None-Match": etag})
+    headers = Headers(raw=second[0]["headers"])
+    assert second[0]["status"] == 304
+    assert body_of(second) == b""
+    assert headers["etag"] == etag
+    assert "content-type" not in headers
+
+
+def test_if_none_match_uses_the_weak_comparison() -> None:
+    middleware = ClientCacheMiddleware(make_app([b'{"id":1}']))
+    etag = Headers(raw=call(middleware)[0]["headers"])["etag"]
+
+    assert call(middleware, headers={"If-None-Match": f"W/{etag}"})[0]["status"] == 304
+    assert call(middleware, headers={"If-None-Match": f'"other", W/{etag}'})[0]["status"] == 304
+    assert call(middleware, headers={"If-None-Match": "*"})[0]["status"] == 304
+    assert call(middleware, headers={"If-None-Match": '"other"'})[0]["status"] == 200
+
+
+def test_bodies_above_etag_max_bytes_pass_through() -> None:
+    middleware = ClientCacheMiddleware(make_app([b"a" * 8, b"b" * 8, b"c" * 8]), etag_max_bytes=10)
+    messages = call(middleware)
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert messages[0]["status"] == 200
+    assert "etag" not in headers
+    assert headers["cache-control"] == "public, no-cache"
+    assert body_of(messages) == b"a" * 8 + b"b" * 8 + b"c" * 8
+
+
+def test_non_get_requests_are_not_stored_nor_tagged() -> None:
+    messages = call(ClientCacheMiddleware(make_app([b"{}"])), method="POST")
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert headers["cache-control"] == "no-store"
+    assert "etag" not in headers
+    assert body_of(messages) == b"{}"
+
+
+def test_non_200_responses_are_left_alone() -> None:
+    middleware = ClientCacheMiddleware(make_app([b'{"detail":"Not found"}'], status=404))
+    messages = call(middleware, headers={"If-None-Match": "*"})
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert messages[0]["status"] == 404
+    assert "etag" not in headers
+    assert body_of(messages) == b'{"detail":"Not found"}'
+
+
+def test_authorized_requests_are_cached_privately() -> None:
+    messages = call(ClientCacheMiddleware(make_app([b"{}"])), headers={"Authorization": "Bearer token"})
+
+    assert Headers(raw=messages[0]["headers"])["cache-control"] == "private, no-cache"
@@ -0,0 +1,79 @@
+import gzip
+
+from starlette.datastructures import Headers
+from starlette.types import Message
+
+from src.app.middleware.compression_middleware import CompressionMiddleware, parse_accept_encoding
+from tests.helpers.asgi import body_of, call, make_app
+
+BODY = b'{"name":"item","value":"compressible"}' * 100
+
+
+def call_accepting(middleware: CompressionMiddleware, accept_encoding: str = "gzip") -> list[Message]:
+    return call(middleware, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_parse_accept_encoding() -> None:
+    assert parse_accept_encoding("gzip;q=0.5, BR, zstd;q=0, deflate;q=x") == {
+        "gzip": 0.5,
+        "br": 1.0,
+        "zstd": 0.0,
+        "deflate": 0.0,
+    }
+
+
+def test_negotiation_follows_q_values_then_preference() -> None:
+    middleware = CompressionMiddleware(make_app([BODY]))
+    # negotiation does not need the compression libraries, only the list of offered encodings
+    middleware.encodings = ["zstd", "br", "gzip"]
+
+    assert middleware._negotiate("gzip, br, zstd") == "zstd"
+    assert middleware._negotiate("zstd;q=0.5, br;q=0.8, gzip") == "gzip"
+    assert middleware._negotiate("zstd;q=0, *") == "br"
+    assert middleware._negotiate("*;q=0") is None
+    assert middleware._negotiate("identity") is None
+
+
+def test_q_zero_disables_an_encoding() -> None:
+    messages = call_accepting(CompressionMiddleware(make_app([BODY]), encodings=["gzip"]), accept_encoding="gzip;q=0")
+
+    assert "content-encoding" not in Headers(raw=messages[0]["headers"])
+    assert body_of(messages) == BODY
+
+
+def test_bodies_below_minimum_size_are_sent_as_is() -> None:
+    messages = call_accepting(CompressionMiddleware(make_app([b'{"id":1}']), minimum_size=1024, encodings=["gzip"]))
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert "content-encoding" not in headers
+    assert headers["vary"] == "Accept-Encoding"
+    assert body_of(messages) == b'{"id":1}'
+
+
+def test_bodies_above_minimum_size_are_compressed() -> None:
+    messages = call_accepting(CompressionMiddleware(make_app([BODY]), minimum_size=1024, encodings=["gzip"]))
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body_of(messages))
+    assert gzip.decompress(body_of(messages)) == BODY
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk() -> None:
+    chunks = [BODY[:1500], BODY[1500:3000], BODY[3000:]]
+    messages = call_accepting(CompressionMiddleware(make_app(chunks), encodings=["gzip"]))
+    headers = Headers(raw=messages[0]["headers"])
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert messages[-1].get("more_body", False) is False
+    assert gzip.decompress(body_of(messages)) == BODY
+
+
+def test_already_encoded_responses_are_left_alone() -> None:
+    app = make_app([BODY], headers=[(b"content-encoding", b"zstd")])
+    messages = call_accepting(CompressionMiddleware(app, encodings=["gzip"]))
+
+    assert Headers(raw=messages[0]["headers"])["content-encoding"] == "zstd"
+    assert body_of(messages) == BODY
@@ -0,0 +1,31 @@
+from src.app.core.utils.master_data_import import VALUE_MAX_LENGTH, _validate_chunk
+
+VALID_CODES = {"color"}
+
+
+def test_valid_rows_are_staged() -> None:
+    chunk = [(2, {"code": "color", "name": "Red", "value": "#ff0000", "data": '{"hex": true}'})]
+    records, errors = _validate_chunk(chunk, VALID_CODES)
+
+    assert errors == []
+    assert records == [(2, "color", "Red", "#ff0000", '{"hex":true}')]
+
+
+def test_over_long_value_is_reported_for_its_line_only() -> None:
+    chunk = [
+        (2, {"code": "color", "name": "Red", "value": "r" * (VALUE_MAX_LENGTH + 1)}),
+        (3, {"code": "color", "name": "Blue", "value": "b" * VALUE_MAX_LENGTH}),
+    ]
+    records, errors = _validate_chunk(chunk, VALID_CODES)
+
+    assert [record[0] for record in records] == [3]
+    assert [error["line"] for error in errors] == [2]
+    assert str(VALUE_MAX_LENGTH) in errors[0]["detail"]
+
+
+def test_unknown_code_and_unparsable_rows_are_reported() -> None:
+    chunk = [(2, {"code": "size", "name": "Large"}), (3, ValueError("unexpected character"))]
+    records, errors = _validate_chunk(chunk, VALID_CODES)
+
+    assert records == []
+    assert [error["line"] for error in errors] == [2, 3]
@@ -0,0 +1,28 @@
+import pytest
+from fastcrud.exceptions.http_exceptions import BadRequestException
+
+from src.app.core.pagination import cursor_paginated_response, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+def test_empty_cursor_starts_from_first_page() -> None:
+    assert decode_cursor("") is None
+
+
+def test_invalid_cursor_is_rejected() -> None:
+    with pytest.raises(BadRequestException):
+        decode_cursor("not-a-cursor")
+
+
+def test_next_cursor_only_when_more_items() -> None:
+    items = [{"id": i} for i in range(1, 12)]
+
+    response = cursor_paginated_response(items, limit=10)
+    assert len(response["data"]) == 10
+    assert decode_cursor(response["next_cursor"]) == 10
+
+    response = cursor_paginated_response(items[:10], limit=10)
+    assert response["next_cursor"] is None